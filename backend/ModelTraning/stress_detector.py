@@ -7,6 +7,9 @@ Usage:
     python stress_detector.py --realtime                    # Real-time webcam detection
     python stress_detector.py image.jpg                     # Single image analysis
     python stress_detector.py /path/to/images/ --output results.csv  # Batch processing
+    python stress_detector.py --realtime --tflite           # Use float16 TFLite model
+    python stress_detector.py --realtime --int8 --calibration-dir faces/  # Use int8 TFLite model
+    python stress_detector.py --realtime --face-detector face_detection_yunet_2023mar.onnx  # YuNet faces
 
 Real-time Controls:
     - Press 'q' to quit
@@ -17,19 +20,129 @@ Real-time Controls:
 import sys
 import os
 import argparse
+import csv
 import numpy as np
 import cv2
 import time
+import queue
+import threading
+from itertools import islice
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure TensorFlow's CPU threading before it is imported
+CPU_COUNT = os.cpu_count() or 1
+os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '1')
+os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(CPU_COUNT))
+os.environ.setdefault('TF_NUM_INTEROP_THREADS', '2')
+
+import tensorflow as tf
 from tensorflow.keras.models import load_model
-from tensorflow.keras.utils import load_img, img_to_array
 import warnings
 warnings.filterwarnings('ignore')
 
+tf.config.threading.set_intra_op_parallelism_threads(CPU_COUNT)
+tf.config.threading.set_inter_op_parallelism_threads(2)
+
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff'})
+
+def iter_image_files(directory_path):
+    """Yield (filename, path) for every image file in a directory."""
+    with os.scandir(directory_path) as entries:
+        for entry in entries:
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                yield entry.name, entry.path
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional; without it postprocess() runs as plain Python
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+@njit(cache=True)
+def postprocess(preds, base_scores, level_ids):
+    """Argmax each row of class probabilities and gather its stress level and score."""
+    n = preds.shape[0]
+    idx = np.empty(n, np.int64)
+    conf = np.empty(n, np.float32)
+    levels = np.empty(n, np.int8)
+    scores = np.empty(n, np.float32)
+    for i in range(n):
+        best = 0
+        for j in range(1, preds.shape[1]):
+            if preds[i, j] > preds[i, best]:
+                best = j
+        idx[i] = best
+        conf[i] = preds[i, best]
+        levels[i] = level_ids[best]
+        scores[i] = base_scores[best] * preds[i, best]
+    return idx, conf, levels, scores
+
+def convert_to_tflite(model_path, tflite_path):
+    """Convert a Keras .h5 model to a float16-quantized TFLite model."""
+    keras_model = load_model(model_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    tflite_model = converter.convert()
+    with open(tflite_path, 'wb') as f:
+        f.write(tflite_model)
+    return tflite_path
+
+def representative_dataset_gen(calibration_dir, num_samples=100):
+    """Build a representative dataset generator from a folder of face crops."""
+    image_paths = sorted(path for _, path in iter_image_files(calibration_dir))
+
+    def gen():
+        yielded = 0
+        for image_path in image_paths:
+            face = cv2.imread(image_path)
+            if face is None:
+                continue
+            face_rgb = cv2.cvtColor(cv2.resize(face, (64, 64)), cv2.COLOR_BGR2RGB)
+            yield [np.expand_dims(face_rgb.astype(np.float32) / 255.0, axis=0)]
+            yielded += 1
+            if yielded >= num_samples:
+                break
+
+    return gen
+
+def convert_to_tflite_int8(model_path, tflite_path, calibration_dir, num_samples=100):
+    """Convert a Keras .h5 model to a full-integer int8 TFLite model."""
+    keras_model = load_model(model_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset_gen(calibration_dir, num_samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+    with open(tflite_path, 'wb') as f:
+        f.write(tflite_model)
+    return tflite_path
+
 class StressDetector:
-    def __init__(self, model_path='stress_cnn_model.h5'):
+    def __init__(self, model_path='stress_cnn_model.h5', use_tflite=False, use_int8=False, calibration_dir=None,
+                 face_detector_path=None):
         """Initialize the stress detector with the trained model."""
         self.model_path = model_path
+        self.use_tflite = use_tflite or use_int8
+        self.use_int8 = use_int8
+        self.calibration_dir = calibration_dir
         self.model = None
+        self.keras_infer = None
+        # Fused uint8 BGR crops -> (class id, confidence) graph for realtime frames
+        self.keras_infer_frames = None
+        self.interpreter = None
+        # Two interpreters so realtime mode can double-buffer invoke() calls
+        self.interpreters = []
+        self.tensor_details = []
+        # (scale, zero_point) pairs, set only for int8 models
+        self.input_quantization = None
+        self.output_quantization = None
         self.class_names = ['angry', 'disgusted', 'fearful', 'happy', 'neutral', 'sad', 'surprised']
         self.emotion_to_stress = {
             "happy": ("Normal", 0.2),
@@ -40,21 +153,67 @@ class StressDetector:
             "sad": ("High", 0.75),
             "disgusted": ("High", 0.9),
         }
+        # emotion_to_stress flattened into arrays indexed by class id
+        self.stress_levels = ['Normal', 'Medium', 'High']
+        self.base_scores = np.array(
+            [self.emotion_to_stress[name][1] for name in self.class_names], dtype=np.float32)
+        self.level_ids = np.array(
+            [self.stress_levels.index(self.emotion_to_stress[name][0]) for name in self.class_names], dtype=np.int8)
+        # BGR box colors indexed by stress level id: green, yellow, red
+        self._lvl_color = np.array([(0, 255, 0), (0, 255, 255), (0, 0, 255)], dtype=np.uint8)
 
         # Initialize face detector
+        cv2.setUseOptimized(True)
+        cv2.setNumThreads(cv2.getNumberOfCPUs())
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # Optional YuNet CNN face detector; the Haar cascade is the fallback
+        self.yunet = None
+        self.yunet_input_size = None
+        if face_detector_path:
+            self.load_face_detector(face_detector_path)
+        # Frames are downsampled by this factor before running the cascade
+        self.detection_scale = 0.5
+
+        # LRU cache of recent detections keyed by a 16x16 grayscale fingerprint
+        self.detection_cache = OrderedDict()
+        self.detection_cache_size = 8
+        self.fingerprint_tolerance = 5
+        # Recent (bbox, result, timestamp) per face; faces that barely moved
+        # reuse their cached result instead of running the model again
+        self.face_tracks = []
+        self.track_iou_threshold = 0.9
+        self.track_max_age = 0.3  # seconds
+
+        # Reusable buffers for face crops so preprocessing doesn't allocate per face
+        self._face_buf_u8 = np.empty((8, 64, 64, 3), dtype=np.uint8)
+        self._face_buf_f32 = np.empty((8, 64, 64, 3), dtype=np.float32)
+        self._face_buf_index = 0
 
         # Stress detection state
         self.last_detection_time = 0
         self.sleep_duration = 10  # seconds
+        self.paused = False
 
         self.load_model()
 
     def load_model(self):
         """Load the trained model."""
         try:
-            if os.path.exists(self.model_path):
+            if self.use_tflite:
+                self.load_tflite_model()
+            elif os.path.exists(self.model_path):
                 self.model = load_model(self.model_path)
+                # Graph-mode, XLA-compiled forward pass instead of eager model.predict
+                self.keras_infer = tf.function(
+                    lambda x: self.model(x, training=False),
+                    input_signature=[tf.TensorSpec(self.model.input_shape, tf.float32)],
+                    jit_compile=True
+                )
+                self.keras_infer_frames = tf.function(
+                    self._infer_frames,
+                    input_signature=[tf.TensorSpec((None,) + tuple(self.model.input_shape[1:]), tf.uint8)],
+                    jit_compile=True
+                )
                 print(f"✅ Model loaded successfully from {self.model_path}")
             else:
                 print(f"❌ Model file not found: {self.model_path}")
@@ -64,15 +223,131 @@ class StressDetector:
             print(f"❌ Error loading model: {e}")
             sys.exit(1)
 
+    def load_tflite_model(self):
+        """Load the TFLite model, converting the .h5 model first if needed."""
+        suffix = '_int8.tflite' if self.use_int8 else '.tflite'
+        tflite_path = os.path.splitext(self.model_path)[0] + suffix
+        if not os.path.exists(tflite_path):
+            if not os.path.exists(self.model_path):
+                print(f"❌ Model file not found: {self.model_path}")
+                print("Please ensure the model file exists in the same directory.")
+                sys.exit(1)
+            if self.use_int8:
+                if not self.calibration_dir or not os.path.isdir(self.calibration_dir):
+                    print("❌ int8 conversion requires --calibration-dir with sample face images")
+                    sys.exit(1)
+                print(f"🔄 Converting {self.model_path} to TFLite (int8)...")
+                convert_to_tflite_int8(self.model_path, tflite_path, self.calibration_dir)
+            else:
+                print(f"🔄 Converting {self.model_path} to TFLite (float16)...")
+                convert_to_tflite(self.model_path, tflite_path)
+
+        num_threads = max(1, (os.cpu_count() or 2) // 2)
+        for _ in range(2):
+            interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=num_threads)
+            interpreter.allocate_tensors()
+            self.interpreters.append(interpreter)
+            self.tensor_details.append([interpreter.get_input_details(), interpreter.get_output_details()])
+        self.interpreter = self.interpreters[0]
+
+        input_details, output_details = self.tensor_details[0]
+        if input_details[0]['dtype'] == np.int8:
+            self.input_quantization = input_details[0]['quantization']
+            self.output_quantization = output_details[0]['quantization']
+        # Mark the detector as ready for the model-is-loaded checks
+        self.model = self.interpreter
+        print(f"✅ TFLite model loaded successfully from {tflite_path}")
+
+    def load_face_detector(self, face_detector_path):
+        """Load the YuNet face detector, falling back to the Haar cascade."""
+        if not hasattr(cv2, 'FaceDetectorYN'):
+            print("⚠️  This OpenCV build has no FaceDetectorYN, using Haar cascade")
+            return
+        if not os.path.exists(face_detector_path):
+            print(f"⚠️  Face detector model not found: {face_detector_path}, using Haar cascade")
+            return
+
+        self.yunet = cv2.FaceDetectorYN.create(face_detector_path, '', (320, 240), 0.6, 0.3, 5000)
+        self.yunet_input_size = (320, 240)
+        print(f"✅ YuNet face detector loaded from {face_detector_path}")
+
+    def run_model(self, batch, slot=0):
+        """Run the model on a preprocessed batch and return class probabilities."""
+        if self.interpreter is not None:
+            # Each interpreter slot must only be driven by one thread at a time
+            interpreter = self.interpreters[slot]
+            input_details, output_details = self.tensor_details[slot]
+            input_index = input_details[0]['index']
+            if tuple(input_details[0]['shape']) != batch.shape:
+                # Resize the interpreter for the new batch size
+                interpreter.resize_tensor_input(input_index, batch.shape)
+                interpreter.allocate_tensors()
+                input_details = interpreter.get_input_details()
+                output_details = interpreter.get_output_details()
+                self.tensor_details[slot] = [input_details, output_details]
+            interpreter.set_tensor(input_index, batch)
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_details[0]['index'])
+            if self.output_quantization is not None:
+                scale, zero_point = self.output_quantization
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output
+        return self.keras_infer(batch).numpy()
+
+    def _infer_frames(self, x):
+        """BGR->RGB, normalize, forward pass and argmax fused into one XLA graph."""
+        x = tf.cast(tf.reverse(x, axis=[-1]), tf.float32) * (1.0 / 255.0)
+        p = self.model(x, training=False)
+        return tf.argmax(p, axis=1), tf.reduce_max(p, axis=1)
+
+    def classify_batch(self, predictions):
+        """Map a batch of class probabilities to emotion and stress results."""
+        preds = np.ascontiguousarray(predictions, dtype=np.float32)
+        idx, conf, levels, scores = postprocess(preds, self.base_scores, self.level_ids)
+        return self._build_results(idx, conf, levels, scores)
+
+    def classify_indices(self, idx, conf):
+        """Map predicted class ids and confidences to emotion and stress results."""
+        levels = self.level_ids[idx]
+        scores = self.base_scores[idx] * conf
+        return self._build_results(idx, conf, levels, scores)
+
+    def _build_results(self, idx, conf, levels, scores):
+        """Build the result dicts from postprocessed arrays."""
+        return [
+            {
+                'emotion': self.class_names[idx[i]],
+                'confidence': float(conf[i]),
+                'stress_level': self.stress_levels[levels[i]],
+                'lvl_id': int(levels[i]),
+                'stress_score': round(float(scores[i]), 2)
+            }
+            for i in range(len(idx))
+        ]
+
+    def normalize_input(self, rgb):
+        """Convert an RGB image in the 0-255 range to the model's input format."""
+        if self.input_quantization is not None:
+            # Fold the /255 normalization into the int8 quantization step
+            scale, zero_point = self.input_quantization
+            q = np.round(rgb / (255.0 * scale) + zero_point)
+            return np.clip(q, -128, 127).astype(np.int8)
+        return rgb.astype(np.float32) * (1.0 / 255.0)
+
+    def _prep(self, bgr_img):
+        """Resize a BGR image to the model input size and normalize it."""
+        resized = cv2.resize(bgr_img, (64, 64), interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+        # Normalize and add batch dimension
+        return self.normalize_input(rgb)[None, ...], resized
+
     def preprocess_image(self, image_path):
         """Preprocess the image for model prediction."""
         try:
-            # Load and resize image
-            img = load_img(image_path, target_size=(64, 64))
-            # Convert to array and normalize
-            img_array = img_to_array(img) / 255.0
-            # Add batch dimension
-            img_array = np.expand_dims(img_array, axis=0)
+            img = cv2.imread(image_path)
+            if img is None:
+                raise ValueError("unable to read image")
+            img_array, _ = self._prep(img)
             return img_array
         except Exception as e:
             print(f"❌ Error preprocessing image {image_path}: {e}")
@@ -91,131 +366,256 @@ class StressDetector:
 
         try:
             # Make prediction
-            predictions = self.model.predict(processed_image, verbose=0)
-            predicted_class_idx = np.argmax(predictions[0])
-            predicted_class = self.class_names[predicted_class_idx]
-            confidence = float(predictions[0][predicted_class_idx])
-
-            # Map to stress level
-            stress_level, base_score = self.emotion_to_stress[predicted_class]
-            stress_score = round(base_score * confidence, 2)
-
-            return {
-                'emotion': predicted_class,
-                'confidence': confidence,
-                'stress_level': stress_level,
-                'stress_score': stress_score
-            }
+            predictions = self.run_model(processed_image)
+            return self.classify_batch(predictions[:1])[0]
 
         except Exception as e:
             print(f"❌ Error making prediction: {e}")
             return None
 
-    def predict_from_directory(self, directory_path, output_file=None):
+    def predict_from_directory(self, directory_path, output_file=None, batch_size=32):
         """Predict stress for all images in a directory."""
         if not os.path.exists(directory_path):
             print(f"❌ Directory not found: {directory_path}")
             return
 
+        if self.model is None:
+            print("❌ Model not loaded!")
+            return
+
         results = []
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
 
         print(f"🔍 Scanning directory: {directory_path}")
 
-        for filename in os.listdir(directory_path):
-            if any(filename.lower().endswith(ext) for ext in image_extensions):
-                image_path = os.path.join(directory_path, filename)
-                print(f"📸 Processing: {filename}")
-
-                result = self.predict_stress(image_path)
-                if result:
-                    result['filename'] = filename
-                    results.append(result)
-                    print(f"   Emotion: {result['emotion']} ({result['confidence']*100:.1f}%)")
-                    print(f"   Stress: {result['stress_level']} (Score: {result['stress_score']})")
-                else:
-                    print(f"   ❌ Failed to process {filename}")
+        image_files = iter_image_files(directory_path)
+
+        # Progress output and CSV rows are handled by a background writer so
+        # the inference loop never waits on stdout or disk
+        result_queue = queue.Queue()
+        writer = threading.Thread(target=self._results_writer, args=(result_queue, output_file), daemon=True)
+        writer.start()
+
+        # Run the model once per mini-batch instead of once per image
+        while True:
+            chunk = list(islice(image_files, batch_size))
+            if not chunk:
+                break
+
+            batch_names = []
+            batch_arrays = []
+            for filename, image_path in chunk:
+                processed_image = self.preprocess_image(image_path)
+                if processed_image is None:
+                    result_queue.put((filename, None))
+                    continue
+                batch_names.append(filename)
+                batch_arrays.append(processed_image[0])
+
+            if not batch_arrays:
+                continue
 
-        # Save results if requested
-        if output_file and results:
             try:
-                with open(output_file, 'w') as f:
-                    f.write("Filename,Emotion,Confidence,Stress_Level,Stress_Score\n")
-                    for result in results:
-                        f.write(f"{result['filename']},{result['emotion']},{result['confidence']:.4f},{result['stress_level']},{result['stress_score']}\n")
-                print(f"✅ Results saved to {output_file}")
+                predictions = self.run_model(np.stack(batch_arrays))
             except Exception as e:
-                print(f"❌ Error saving results: {e}")
+                print(f"❌ Error making prediction: {e}")
+                continue
+
+            for filename, result in zip(batch_names, self.classify_batch(predictions)):
+                result['filename'] = filename
+                results.append(result)
+                result_queue.put((filename, result))
+
+        result_queue.put(None)
+        writer.join()
 
         return results
 
+    def _results_writer(self, result_queue, output_file=None):
+        """Print progress and stream CSV rows for predict_from_directory."""
+        csv_file = None
+        csv_writer = None
+        if output_file:
+            try:
+                csv_file = open(output_file, 'w', newline='', buffering=1 << 20)
+                csv_writer = csv.writer(csv_file)
+                csv_writer.writerow(["Filename", "Emotion", "Confidence", "Stress_Level", "Stress_Score"])
+            except Exception as e:
+                print(f"❌ Error saving results: {e}")
+
+        written = 0
+        while True:
+            item = result_queue.get()
+            if item is None:
+                break
+
+            filename, result = item
+            print(f"📸 Processing: {filename}")
+            if result is None:
+                print(f"   ❌ Failed to process {filename}")
+                continue
+
+            print(f"   Emotion: {result['emotion']} ({result['confidence']*100:.1f}%)")
+            print(f"   Stress: {result['stress_level']} (Score: {result['stress_score']})")
+            if csv_writer is not None:
+                csv_writer.writerow([filename, result['emotion'], f"{result['confidence']:.4f}",
+                                     result['stress_level'], result['stress_score']])
+                written += 1
+
+        if csv_file is not None:
+            csv_file.close()
+            if written:
+                print(f"✅ Results saved to {output_file}")
+
     def detect_faces(self, frame):
         """Detect faces in a frame using OpenCV."""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
-        )
+        scale = self.detection_scale
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        # Reuse the boxes of a near-identical recent frame
+        fingerprint = cv2.resize(gray, (16, 16), interpolation=cv2.INTER_AREA).astype(np.int16)
+        for key, (cached_fingerprint, cached_faces) in self.detection_cache.items():
+            if np.abs(fingerprint - cached_fingerprint).max() < self.fingerprint_tolerance:
+                self.detection_cache.move_to_end(key)
+                return cached_faces
+
+        if self.yunet is not None:
+            faces = self.detect_faces_yunet(small)
+        else:
+            min_side = int(30 * scale)
+            faces = self.face_cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(min_side, min_side)
+            )
+        if len(faces) > 0:
+            # Scale the boxes back to full-frame coordinates
+            faces = (faces / scale).astype(int)
+
+        self.detection_cache[fingerprint.tobytes()] = (fingerprint, faces)
+        if len(self.detection_cache) > self.detection_cache_size:
+            self.detection_cache.popitem(last=False)
         return faces
 
+    def detect_faces_yunet(self, image):
+        """Detect faces with YuNet and return Haar-style (x, y, w, h) boxes."""
+        height, width = image.shape[:2]
+        if self.yunet_input_size != (width, height):
+            self.yunet.setInputSize((width, height))
+            self.yunet_input_size = (width, height)
+
+        # Rows are (x, y, w, h, 5 landmark pairs, score)
+        _, detections = self.yunet.detect(image)
+        if detections is None:
+            return ()
+        return np.maximum(detections[:, :4], 0).astype(int)
+
     def preprocess_face(self, frame, face_coords):
         """Extract and preprocess face from frame."""
         x, y, w, h = face_coords
         face = frame[y:y+h, x:x+w]
+        if self.input_quantization is not None:
+            return self._prep(face)
 
-        # Resize to model input size
-        face_resized = cv2.resize(face, (64, 64))
-
-        # Convert to RGB if needed
-        if face_resized.shape[2] == 3:
-            face_rgb = cv2.cvtColor(face_resized, cv2.COLOR_BGR2RGB)
-        else:
-            face_rgb = face_resized
+        i = self._face_buf_index
+        self._face_buf_index = (i + 1) % len(self._face_buf_u8)
+        face_resized = cv2.resize(face, (64, 64), dst=self._face_buf_u8[i], interpolation=cv2.INTER_AREA)
+        if self.keras_infer_frames is not None:
+            # The fused graph takes the raw uint8 BGR crop
+            return self._face_buf_u8[i:i+1], face_resized
 
-        # Normalize and add batch dimension
-        face_array = face_rgb.astype(np.float32) / 255.0
-        face_array = np.expand_dims(face_array, axis=0)
+        # Swap BGR to RGB while normalizing into the float32 buffer
+        np.multiply(face_resized[..., ::-1], np.float32(1.0 / 255.0), out=self._face_buf_f32[i], casting='unsafe')
 
-        return face_array, face_resized
+        # The returned arrays are views into the pool and are overwritten
+        # once the pool wraps around, so callers must copy what they keep
+        return self._face_buf_f32[i:i+1], face_resized
 
     def predict_stress_from_frame(self, frame):
         """Predict stress from a video frame."""
         if self.model is None:
             return None
 
-        # Detect faces
-        faces = self.detect_faces(frame)
-        results = []
-
+        bboxes, batch, reused = self.prepare_faces(frame)
+        return self.classify_faces(bboxes, batch, reused)
+
+    @staticmethod
+    def _iou(box_a, box_b):
+        """Intersection over union of two (x, y, w, h) boxes."""
+        ax, ay, aw, ah = box_a
+        bx, by, bw, bh = box_b
+        inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+        inter_h = min(ay + ah, by + bh) - max(ay, by)
+        if inter_w <= 0 or inter_h <= 0:
+            return 0.0
+        inter = inter_w * inter_h
+        return inter / float(aw * ah + bw * bh - inter)
+
+    def match_track(self, bbox, now):
+        """Return the cached (result, timestamp) for a face that hasn't moved."""
+        for track_bbox, result, timestamp in self.face_tracks:
+            if now - timestamp < self.track_max_age and self._iou(bbox, track_bbox) >= self.track_iou_threshold:
+                return result, timestamp
+        return None
+
+    def prepare_faces(self, frame):
+        """Detect faces and return (bboxes, batch, reused) for inference and cached tracks."""
+        faces = [tuple(int(v) for v in face) for face in self.detect_faces(frame)]
+
+        now = time.time()
+        bboxes = []
+        batch = None
+        reused = []
         for (x, y, w, h) in faces:
-            try:
-                # Preprocess face
-                face_array, face_resized = self.preprocess_face(frame, (x, y, w, h))
-
-                # Make prediction
-                predictions = self.model.predict(face_array, verbose=0)
-                predicted_class_idx = np.argmax(predictions[0])
-                predicted_class = self.class_names[predicted_class_idx]
-                confidence = float(predictions[0][predicted_class_idx])
-
-                # Map to stress level
-                stress_level, base_score = self.emotion_to_stress[predicted_class]
-                stress_score = round(base_score * confidence, 2)
-
-                results.append({
-                    'bbox': (x, y, w, h),
-                    'emotion': predicted_class,
-                    'confidence': confidence,
-                    'stress_level': stress_level,
-                    'stress_score': stress_score
-                })
+            match = self.match_track((x, y, w, h), now)
+            if match is not None:
+                result, timestamp = match
+                reused.append((dict(result, bbox=(x, y, w, h)), timestamp))
+                continue
 
+            try:
+                face_array, _ = self.preprocess_face(frame, (x, y, w, h))
             except Exception as e:
                 print(f"Error processing face: {e}")
                 continue
 
+            # Copy each face out of the buffer pool into the batch right away
+            if batch is None:
+                batch = np.empty((len(faces),) + face_array.shape[1:], dtype=face_array.dtype)
+            batch[len(bboxes)] = face_array[0]
+            bboxes.append((x, y, w, h))
+
+        if not bboxes:
+            return [], None, reused
+        return bboxes, batch[:len(bboxes)], reused
+
+    def classify_faces(self, bboxes, batch, reused=(), slot=0):
+        """Classify a stacked batch of faces in a single model call."""
+        results = []
+        if batch is not None:
+            try:
+                if self.keras_infer_frames is not None:
+                    idx, conf = self.keras_infer_frames(batch)
+                    results = self.classify_indices(idx.numpy(), conf.numpy())
+                else:
+                    predictions = self.run_model(batch, slot)
+                    results = self.classify_batch(predictions)
+            except Exception as e:
+                print(f"Error processing faces: {e}")
+
+        now = time.time()
+        tracks = []
+        for bbox, result in zip(bboxes, results):
+            result['bbox'] = bbox
+            tracks.append((bbox, result, now))
+        # Reused results keep their original timestamp so they expire
+        for result, timestamp in reused:
+            results.append(result)
+            tracks.append((result['bbox'], result, timestamp))
+
+        if tracks:
+            self.face_tracks = tracks
         return results
 
     def should_detect_stress(self):
@@ -235,12 +635,7 @@ class StressDetector:
             x, y, w, h = result['bbox']
 
             # Choose color based on stress level
-            if result['stress_level'] == 'High':
-                color = (0, 0, 255)  # Red
-            elif result['stress_level'] == 'Medium':
-                color = (0, 255, 255)  # Yellow
-            else:
-                color = (0, 255, 0)  # Green
+            color = tuple(int(c) for c in self._lvl_color[result['lvl_id']])
 
             # Draw rectangle around face
             cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
@@ -266,50 +661,63 @@ class StressDetector:
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         cap.set(cv2.CAP_PROP_FPS, 30)
 
-        paused = False
         stress_detected = False
+        self.paused = False
+        stop_event = threading.Event()
+
+        # Bounded queues between the pipeline stages; full queues drop the
+        # oldest item so every stage always works on the freshest frame
+        capture_queue = queue.Queue(maxsize=2)
+        detection_queue = queue.Queue(maxsize=2)
+        render_queue = queue.Queue(maxsize=2)
+
+        workers = [
+            threading.Thread(target=self._capture_worker, args=(cap, capture_queue, stop_event), daemon=True),
+            threading.Thread(target=self._detection_worker, args=(capture_queue, detection_queue, stop_event), daemon=True),
+            threading.Thread(target=self._inference_worker, args=(detection_queue, render_queue, stop_event), daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
 
         print("✅ Camera opened successfully. Starting detection...")
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("❌ Failed to grab frame")
-                break
+        while not stop_event.is_set():
+            try:
+                item = render_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
 
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
+            if item is None:
+                break
 
+            frame, results = item
             current_time = time.time()
 
-            if not paused and self.should_detect_stress():
-                # Detect stress in current frame
-                results = self.predict_stress_from_frame(frame)
+            if results:
+                # Check if any face shows high stress
+                high_stress_faces = [r for r in results if r['stress_level'] == 'High']
 
-                if results:
-                    # Check if any face shows high stress
-                    high_stress_faces = [r for r in results if r['stress_level'] == 'High']
+                if high_stress_faces and not stress_detected:
+                    print(f"🚨 HIGH STRESS DETECTED! Sleeping for {self.sleep_duration} seconds...")
+                    stress_detected = True
+                    self.update_detection_time()
 
-                    if high_stress_faces and not stress_detected:
-                        print(f"🚨 HIGH STRESS DETECTED! Sleeping for {self.sleep_duration} seconds...")
-                        stress_detected = True
-                        self.update_detection_time()
+                    # Flash red overlay for alert
+                    overlay = frame.copy()
+                    cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 255), -1)
+                    cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
 
-                        # Flash red overlay for alert
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 255), -1)
-                        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+                    cv2.putText(frame, "HIGH STRESS ALERT!", (50, 50),
+                              cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3)
 
-                        cv2.putText(frame, "HIGH STRESS ALERT!", (50, 50),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3)
+                elif not high_stress_faces:
+                    stress_detected = False
 
-                    elif not high_stress_faces:
-                        stress_detected = False
-
-                    # Draw results on frame
-                    frame = self.draw_results(frame, results)
+                # Draw results on frame
+                frame = self.draw_results(frame, results)
 
             # Display status
+            paused = self.paused
             status_text = "PAUSED" if paused else ("SLEEPING" if not self.should_detect_stress() else "ACTIVE")
             color = (0, 0, 255) if status_text == "SLEEPING" else (0, 255, 0) if status_text == "ACTIVE" else (255, 0, 0)
 
@@ -329,19 +737,123 @@ class StressDetector:
             if key == ord('q'):
                 break
             elif key == ord('s'):
-                paused = not paused
-                print(f"{'Paused' if paused else 'Resumed'} stress detection")
+                self.paused = not self.paused
+                print(f"{'Paused' if self.paused else 'Resumed'} stress detection")
+
+        stop_event.set()
+        for worker in workers:
+            worker.join(timeout=2.0)
 
         cap.release()
         cv2.destroyAllWindows()
         print("✅ Real-time detection stopped")
 
+    @staticmethod
+    def _put_latest(q, item):
+        """Put an item on a bounded queue, dropping the oldest entry if it is full."""
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _capture_worker(self, cap, out_queue, stop_event):
+        """Pipeline stage 1: grab and mirror frames from the camera."""
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                print("❌ Failed to grab frame")
+                break
+
+            # Flip frame horizontally for mirror effect
+            self._put_latest(out_queue, cv2.flip(frame, 1))
+
+        self._put_latest(out_queue, None)
+
+    def _detection_worker(self, in_queue, out_queue, stop_event):
+        """Pipeline stage 2: detect and preprocess faces."""
+        while not stop_event.is_set():
+            try:
+                frame = in_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            if frame is None:
+                break
+
+            if not self.paused and self.should_detect_stress():
+                prepared = self.prepare_faces(frame)
+            else:
+                prepared = ([], None, [])
+            self._put_latest(out_queue, (frame, prepared))
+
+        self._put_latest(out_queue, None)
+
+    def _inference_worker(self, in_queue, out_queue, stop_event):
+        """Pipeline stage 3: classify the detected faces."""
+        if len(self.interpreters) < 2:
+            while not stop_event.is_set():
+                try:
+                    item = in_queue.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+
+                if item is None:
+                    break
+
+                frame, prepared = item
+                self._put_latest(out_queue, (frame, self.classify_faces(*prepared)))
+
+            self._put_latest(out_queue, None)
+            return
+
+        # Double-buffer the TFLite interpreters: frame N+1 is submitted to one
+        # interpreter while frame N is still running on the other
+        slot = 0
+        pending = None
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            while not stop_event.is_set():
+                try:
+                    item = in_queue.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+
+                if item is None:
+                    break
+
+                frame, (bboxes, batch, reused) = item
+                future = executor.submit(self.classify_faces, bboxes, batch, reused, slot)
+                slot = 1 - slot
+
+                if pending is not None:
+                    pending_frame, pending_future = pending
+                    self._put_latest(out_queue, (pending_frame, pending_future.result()))
+                pending = (frame, future)
+
+            if pending is not None:
+                pending_frame, pending_future = pending
+                self._put_latest(out_queue, (pending_frame, pending_future.result()))
+
+        self._put_latest(out_queue, None)
+
 def main():
     parser = argparse.ArgumentParser(description='Stress Detection from Facial Images')
     parser.add_argument('input', nargs='?', help='Path to image file or directory (not needed for --realtime)')
     parser.add_argument('--model', '-m', default='stress_cnn_model.h5',
                        help='Path to the trained model file (default: stress_cnn_model.h5)')
     parser.add_argument('--output', '-o', help='Output CSV file for directory predictions')
+    parser.add_argument('--tflite', action='store_true',
+                       help='Run inference with a float16 TFLite model (converted from --model if missing)')
+    parser.add_argument('--int8', action='store_true',
+                       help='Run inference with a full-integer int8 TFLite model')
+    parser.add_argument('--calibration-dir',
+                       help='Folder of face crops used to calibrate the int8 conversion')
+    parser.add_argument('--face-detector',
+                       help='YuNet ONNX face detector model (default: Haar cascade)')
     parser.add_argument('--realtime', '-r', action='store_true',
                        help='Run real-time stress detection using webcam')
     parser.add_argument('--camera', '-c', type=int, default=0,
@@ -351,7 +863,9 @@ def main():
     args = parser.parse_args()
 
     # Initialize detector
-    detector = StressDetector(args.model)
+    detector = StressDetector(args.model, use_tflite=args.tflite, use_int8=args.int8,
+                              calibration_dir=args.calibration_dir,
+                              face_detector_path=args.face_detector)
 
     if args.realtime:
         # Real-time detection mode
@@ -404,15 +918,16 @@ def main():
             print(f"\n✅ Processed {len(results)} images successfully")
 
             # Summary statistics
-            stress_levels = [r['stress_level'] for r in results]
-            stress_scores = [r['stress_score'] for r in results]
+            total = len(results)
+            stress_scores = np.fromiter((r['stress_score'] for r in results), dtype=np.float32, count=total)
+            level_ids = np.fromiter((r['lvl_id'] for r in results), dtype=np.int8, count=total)
+            counts = np.bincount(level_ids, minlength=len(detector.stress_levels))
 
             print("\n📊 SUMMARY STATISTICS:")
-            print(f"Average Stress Score: {np.mean(stress_scores):.3f}")
+            print(f"Average Stress Score: {stress_scores.mean():.3f}")
             print(f"Stress Level Distribution:")
-            for level in ['Normal', 'Medium', 'High']:
-                count = stress_levels.count(level)
-                percentage = (count / len(stress_levels)) * 100
+            for level, count in zip(detector.stress_levels, counts):
+                percentage = (count / total) * 100
                 print(f"  {level}: {count} images ({percentage:.1f}%)")
         else:
             print("❌ No images processed")
@@ -24,20 +24,12 @@ api_router.include_router(
     tags=["stress"]
 )
 
-# Device command endpoints
+# Device command endpoints (paths carry their own /device prefix)
 api_router.include_router(
     device.router, 
-    prefix="/device", 
     tags=["device"]
 )
 
-# Devices endpoints (by device ID)
-api_router.include_router(
-    device.router, 
-    prefix="/devices", 
-    tags=["devices"]
-)
-
 # Manager dashboard endpoints
 api_router.include_router(
     manager.router, 
@@ -45,20 +37,12 @@ api_router.include_router(
     tags=["manager"]
 )
 
-# Employee self-view endpoints
+# Employee self-view (/me) and employee data (/employee) endpoints
 api_router.include_router(
     employee.router, 
-    prefix="/me", 
     tags=["employee"]
 )
 
-# Employee data endpoints
-api_router.include_router(
-    employee.router, 
-    prefix="/employee", 
-    tags=["employee_data"]
-)
-
 # Journal endpoints
 api_router.include_router(
     journal.router,
@@ -19,7 +19,7 @@ router = APIRouter()
 
 # Employee endpoints
 @router.post("/employees", response_model=Employee)
-async def create_new_employee(
+def create_new_employee(
     employee_data: EmployeeCreate,
     current_user: User = Depends(get_current_manager)
 ) -> Any:
@@ -30,7 +30,7 @@ async def create_new_employee(
     return create_employee(employee_data)
 
 @router.get("/employees", response_model=List[Employee])
-async def read_employees(
+def read_employees(
     current_user: User = Depends(get_current_manager),
     active_only: bool = True
 ) -> Any:
@@ -41,7 +41,7 @@ async def read_employees(
     return employees
 
 @router.get("/employees/{employee_id}", response_model=Employee)
-async def read_employee(
+def read_employee(
     employee_id: str,
     current_user: User = Depends(get_current_manager)
 ) -> Any:
@@ -54,7 +54,7 @@ async def read_employee(
     return employee
 
 @router.put("/employees/{employee_id}", response_model=Employee)
-async def update_employee_info(
+def update_employee_info(
     employee_id: str,
     employee_data: EmployeeUpdate,
     current_user: User = Depends(get_current_manager)
@@ -73,7 +73,7 @@ async def update_employee_info(
 
 # Device endpoints
 @router.post("/devices", response_model=DeviceWithKey)
-async def create_new_device(
+def create_new_device(
     device_data: DeviceCreate,
     current_user: User = Depends(get_current_manager)
 ) -> Any:
@@ -89,7 +89,7 @@ async def create_new_device(
     return create_device(device_data)
 
 @router.get("/devices", response_model=List[Device])
-async def read_devices(
+def read_devices(
     current_user: User = Depends(get_current_manager),
     employee_id: Optional[str] = None,
     active_only: bool = True
@@ -110,7 +110,7 @@ async def read_devices(
     return devices
 
 @router.get("/devices/{device_id}", response_model=Device)
-async def read_device(
+def read_device(
     device_id: str,
     current_user: User = Depends(get_current_manager)
 ) -> Any:
@@ -123,7 +123,7 @@ async def read_device(
     return device
 
 @router.patch("/devices/{device_id}", response_model=Device)
-async def update_device_info(
+def update_device_info(
     device_id: str,
     device_data: DeviceUpdate,
     current_user: User = Depends(get_current_manager)
@@ -146,7 +146,7 @@ async def update_device_info(
 
 # User account management
 @router.patch("/users/{user_id}", response_model=User)
-async def update_user_account(
+def update_user_account(
     user_id: str,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_manager)
@@ -160,13 +160,5 @@ async def update_user_account(
     
     update_user(user_id, user_data)
     
-    # Return updated user
-    updated_user = get_user_by_id(user_id)
-    
-    # Remove password_hash before returning
-    if updated_user and "_id" in updated_user:
-        updated_user.pop("_id", None)
-    if updated_user and "password_hash" in updated_user:
-        updated_user.pop("password_hash", None)
-    
-    return updated_user
+    # Return updated user without _id and password_hash
+    return get_user_by_id(user_id, {"_id": 0, "password_hash": 0})
@@ -1,26 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from typing import Any
 from datetime import timedelta
 from app.core.config import settings
 from app.schemas.schemas import Token, User, UserCreate
-from app.core.security.auth import verify_password, create_access_token
-from app.core.security.deps import get_current_manager
-from app.models.models import get_user_by_username, create_user
+from app.core.security.auth import verify_and_update_password, dummy_verify_password, create_access_token
+from app.core.security.deps import get_current_manager, limiter
+from app.models.models import get_user_by_username, get_login_user, create_user, update_password_hash
+import asyncio
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Password hashing (argon2/bcrypt) is CPU bound: verify off the event loop,
+# at most one hash per core at a time
+PASSWORD_HASH_SEMAPHORE = asyncio.Semaphore(os.cpu_count() or 1)
+
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
+@limiter.limit("10/minute")
+async def login_for_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
+) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = get_user_by_username(form_data.username)
+    user = await run_in_threadpool(get_login_user, form_data.username)
     
     if not user:
+        # Still run a hash check so response time doesn't reveal whether the username exists
+        async with PASSWORD_HASH_SEMAPHORE:
+            await run_in_threadpool(dummy_verify_password)
         logger.warning(f"Login attempt with invalid username: {form_data.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -28,7 +42,12 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(form_data.password, user["password_hash"]):
+    async with PASSWORD_HASH_SEMAPHORE:
+        password_ok, new_hash = await run_in_threadpool(
+            verify_and_update_password, form_data.password, user["password_hash"]
+        )
+    
+    if not password_ok:
         logger.warning(f"Failed login attempt for user: {form_data.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,6 +55,11 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        # Stored hash uses an old scheme or parameters; replace it while we have the password
+        await run_in_threadpool(update_password_hash, user["user_id"], form_data.username, new_hash)
+        logger.info(f"Upgraded password hash for user: {form_data.username}")
+    
     if not user.get("active", True):
         logger.warning(f"Login attempt for inactive user: {form_data.username}")
         raise HTTPException(
@@ -71,7 +95,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     }
 
 @router.post("/register", response_model=User)
-async def register_user(user_data: UserCreate):
+def register_user(user_data: UserCreate):
     """
     Create a new user account (self-registration for employees, manager required for other roles)
     """
@@ -3,19 +3,24 @@ from typing import List, Any, Dict, Optional
 from app.schemas.schemas import Command, CommandUpdate
 from app.models.models import get_pending_commands, update_command
 from app.core.security.deps import verify_device_api_key, limiter, get_current_active_user
+from app.core.security.auth import hash_api_key
+from app.core.config import settings
+from app.db.mongodb import devices_collection
+from app.db.redis_cache import cache
+from pymongo import ReturnDocument
 import logging
 from datetime import datetime
 import uuid
-import hashlib
+import secrets
 import os
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.get("/{device_id}/commands", response_model=List[Command])
+@router.get("/device/{device_id}/commands", response_model=List[Command])
 @limiter.limit("30/minute")
-async def get_device_commands(
+def get_device_commands(
     request: Request,
     device_id: str,
     device: Dict[str, Any] = Depends(verify_device_api_key)
@@ -33,14 +38,7 @@ async def get_device_commands(
             )
         
         # Get pending commands for the device
-        commands = get_pending_commands(device_id)
-        
-        # Clean MongoDB _id from results
-        for cmd in commands:
-            if "_id" in cmd:
-                cmd.pop("_id")
-        
-        return commands
+        return get_pending_commands(device_id)
         
     except HTTPException:
         raise
@@ -51,8 +49,8 @@ async def get_device_commands(
             detail="An error occurred retrieving commands"
         )
 
-@router.post("/commands/ack/{command_id}", response_model=Command)
-async def acknowledge_command(
+@router.post("/device/commands/ack/{command_id}", response_model=Command)
+def acknowledge_command(
     command_id: str,
     update_data: CommandUpdate,
     request: Request,
@@ -63,12 +61,8 @@ async def acknowledge_command(
     API key can be provided either in X-Device-Key header or as api_key query parameter.
     """
     try:
-        # Update command status
-        update_command(command_id, update_data)
-        
-        # Get updated command
-        from app.db.mongodb import commands_collection
-        command = commands_collection.find_one({"command_id": command_id})
+        # Update command status and get the updated command back
+        command = update_command(command_id, update_data)
         
         if not command:
             raise HTTPException(
@@ -76,10 +70,6 @@ async def acknowledge_command(
                 detail="Command not found"
             )
         
-        # Clean MongoDB _id
-        if "_id" in command:
-            command.pop("_id")
-        
         return command
         
     except HTTPException:
@@ -91,8 +81,9 @@ async def acknowledge_command(
             detail="An error occurred updating command"
         )
 
-@router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register_device(
+@router.post("/device/register", status_code=status.HTTP_201_CREATED)
+@router.post("/devices/register", status_code=status.HTTP_201_CREATED)  # used by the Windows client
+def register_device(
     request: Request,
     data: Dict[str, Any] = Body(...),
     current_user: Optional[Dict[str, Any]] = Depends(get_current_active_user)
@@ -133,17 +124,11 @@ async def register_device(
         # Generate a unique device ID
         device_id = f"device-{uuid.uuid4().hex[:8]}"
         
-        # Generate an API key - we'll use a simple hash for consistency
-        api_key_raw = f"{device_id}:{uuid.uuid4().hex}:{datetime.utcnow().isoformat()}"
-        api_key = hashlib.sha256(api_key_raw.encode()).hexdigest()
+        # Generate an API key straight from the OS CSPRNG (256 bits)
+        api_key = secrets.token_urlsafe(32)
         
-        # Import hash_api_key to properly hash the key for storage
-        from app.core.security.auth import hash_api_key
         api_key_hash = hash_api_key(api_key)
         
-        # Get devices collection
-        from app.db.mongodb import devices_collection
-        
         # Check if device_number is already registered (unique constraint)
         existing_device_by_number = devices_collection.find_one({"device_number": device_number})
         if existing_device_by_number:
@@ -152,77 +137,63 @@ async def register_device(
                 detail=f"Device number {device_number} is already registered"
             )
         
-        # Check if employee already has a device of this type
+        # Update the employee's existing device of this type, or create it,
+        # in a single atomic upsert
         query = {"employee_id": employee_id, "device_type": device_type}
         if current_user:
             query["user_id"] = current_user["user_id"]
         
-        existing_device = devices_collection.find_one(query)
-        
-        if existing_device:
-            # Update existing device instead of creating a new one
-            user_info = current_user['username'] if current_user else f"employee {employee_id}"
-            logger.info(f"Updating existing device for {user_info}")
-            
-            # Update device with new keys and info
-            devices_collection.update_one(
-                {"_id": existing_device["_id"]},
-                {"$set": {
+        now = datetime.utcnow()
+        
+        previous = devices_collection.find_one_and_update(
+            query,
+            {
+                "$set": {
                     "device_name": device_name,
                     "device_number": device_number,
                     "device_info": device_info,
-                    "api_key": api_key,
-                    "api_key_hash": api_key_hash,
-                    "updated_at": datetime.utcnow(),
-                    "last_active": datetime.utcnow(),
-                    "active": True,
+                    "api_key_hash": api_key_hash,  # Only the hash is stored
+                    "updated_at": now,
+                    "last_active": now,
+                    "active": True,  # Make sure device is marked as active
                     "status": "active"
-                }}
-            )
-            
-            device_id = existing_device["device_id"]
-            user_info = current_user['username'] if current_user else f"employee {employee_id}"
-            logger.info(f"Device updated: {device_id} for {user_info}")
-        else:
-            # Save device in database
-            device_data = {
-                "device_id": device_id,
-                "employee_id": employee_id,
-                "device_name": device_name,
-                "device_number": device_number,
-                "device_info": device_info,
-                "device_type": device_type,
-                "api_key": api_key,  # Store plain API key for direct comparison
-                "api_key_hash": api_key_hash,
-                "registered_at": datetime.utcnow(),
-                "last_active": datetime.utcnow(),
-                "active": True,  # Make sure device is marked as active
-                "status": "active"
-            }
-            
-            # Add user_id if authenticated
-            if current_user:
-                device_data["user_id"] = current_user["user_id"]
-            
-            # Save to the database
-            devices_collection.insert_one(device_data)
-            user_info = current_user['username'] if current_user else f"employee {employee_id}"
-            logger.info(f"Device registered: {device_id} for {user_info}")
+                },
+                # Query fields (employee_id, device_type, user_id) are copied in on insert
+                "$setOnInsert": {
+                    "device_id": device_id,
+                    "registered_at": now
+                },
+                # Drop any plain API key stored by older registrations
+                "$unset": {"api_key": ""}
+            },
+            projection={"_id": 0, "device_id": 1, "api_key_hash": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
         
-        # Do a verification test to ensure the API key works
-        try:
-            from app.core.security.auth import hash_api_key as verify_hash
-            test_hash = verify_hash(api_key)
-            logger.debug(f"Verification test - API Key: {api_key[:4]}...{api_key[-4:]}, Hash: {test_hash[:4]}...{test_hash[-4:]}")
-            
-            # Try to retrieve the device with the key
-            found = devices_collection.find_one({"api_key": api_key})
-            if found:
-                logger.debug(f"Verification passed - device can be found with API key")
-            else:
-                logger.warning(f"Verification failed - device cannot be found with API key!")
-        except Exception as ve:
-            logger.error(f"Error during verification test: {str(ve)}")
+        user_info = current_user['username'] if current_user else f"employee {employee_id}"
+        if previous is None:
+            logger.info(f"Device registered: {device_id} for {user_info}")
+        else:
+            device_id = previous["device_id"]
+            logger.info(f"Device updated: {device_id} for {user_info}")
+            # The old key was replaced; stop serving it from the auth cache
+            if previous.get("api_key_hash"):
+                cache.delete(f"device_api_key_{previous['api_key_hash']}")
+        
+        # Do a verification test to ensure the API key works (debug only, costs a query)
+        if settings.DEBUG:
+            try:
+                logger.debug(f"Verification test - API Key: {api_key[:4]}...{api_key[-4:]}, Hash: {api_key_hash[:4]}...{api_key_hash[-4:]}")
+                
+                # Try to retrieve the device with the key
+                found = devices_collection.find_one({"api_key_hash": api_key_hash})
+                if found:
+                    logger.debug(f"Verification passed - device can be found with API key")
+                else:
+                    logger.warning(f"Verification failed - device cannot be found with API key!")
+            except Exception as ve:
+                logger.error(f"Error during verification test: {str(ve)}")
         
         # Return the device ID and API key
         return {
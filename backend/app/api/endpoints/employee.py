@@ -1,17 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import List, Any, Optional, Dict
 from app.schemas.schemas import User, StressRecord
 from app.models.models import get_latest_stress_by_employee, get_stress_records_by_employee
 from app.core.security.deps import get_current_employee
 from app.core.config import settings
+from app.db.mongodb import stress_readings_collection
+from app.db.redis_cache import cache
+from datetime import datetime, timedelta
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.get("/stress/latest", response_model=StressRecord)
-async def get_my_latest_stress(
+# Suggestions are static, so their JSON bodies are serialized once at import
+SUGGESTIONS_JSON = {
+    level: orjson.dumps({"suggestions": items})
+    for level, items in settings.STRESS_SUGGESTIONS.items()
+}
+ALL_SUGGESTIONS_JSON = orjson.dumps({"suggestions": settings.STRESS_SUGGESTIONS_ALL})
+NO_SUGGESTIONS_JSON = orjson.dumps({"suggestions": []})
+
+@router.get("/me/stress/latest", response_model=StressRecord)
+def get_my_latest_stress(
     current_user: User = Depends(get_current_employee)
 ) -> Any:
     """
@@ -32,14 +44,10 @@ async def get_my_latest_stress(
             detail="No stress records found"
         )
     
-    # Clean MongoDB _id
-    if "_id" in record:
-        record.pop("_id")
-    
     return record
 
-@router.get("/stress/history", response_model=List[StressRecord])
-async def get_my_stress_history(
+@router.get("/me/stress/history", response_model=List[StressRecord])
+def get_my_stress_history(
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
     limit: int = Query(20, ge=1, le=50),  # Lower limit for employee view
@@ -55,17 +63,10 @@ async def get_my_stress_history(
             detail="No employee profile associated with this user account"
         )
     
-    records = get_stress_records_by_employee(employee_id, from_date, to_date, limit)
-    
-    # Clean MongoDB _id from results
-    for record in records:
-        if "_id" in record:
-            record.pop("_id")
-    
-    return records
+    return get_stress_records_by_employee(employee_id, from_date, to_date, limit)
 
-@router.get("/stress/suggestions", response_model=Dict[str, List[str]])
-async def get_stress_suggestions(
+@router.get("/me/stress/suggestions", response_model=Dict[str, List[str]])
+def get_stress_suggestions(
     current_user: User = Depends(get_current_employee)
 ) -> Any:
     """
@@ -82,15 +83,16 @@ async def get_stress_suggestions(
     
     if not record:
         # If no record, return all suggestions
-        return {"suggestions": [
-            item for sublist in settings.STRESS_SUGGESTIONS.values() for item in sublist
-        ]}
+        return Response(content=ALL_SUGGESTIONS_JSON, media_type="application/json")
     
     stress_level = record.get("stress_level", "Medium")
     
-    return {"suggestions": settings.STRESS_SUGGESTIONS.get(stress_level, [])}
+    return Response(
+        content=SUGGESTIONS_JSON.get(stress_level, NO_SUGGESTIONS_JSON),
+        media_type="application/json"
+    )
 
-@router.get("/privacy", response_model=Dict[str, str])
+@router.get("/me/privacy", response_model=Dict[str, str])
 async def get_privacy_info(
     current_user: User = Depends(get_current_employee)
 ) -> Any:
@@ -99,57 +101,75 @@ async def get_privacy_info(
     """
     return {"privacy_banner": settings.PRIVACY_BANNER}
 
-@router.get("/stress/history/{employee_id}", status_code=status.HTTP_200_OK)
-async def get_employee_stress_history(
+@router.get("/employee/stress/history/{employee_id}", status_code=status.HTTP_200_OK)
+def get_employee_stress_history(
     employee_id: str,
-    days: Optional[int] = Query(7, description="Number of days of history to retrieve")
+    days: Optional[int] = Query(7, description="Number of days of history to retrieve"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of individual readings to return")
 ) -> Any:
     """
     Get stress history for an employee
     """
+    cache_key = f"employee_stress_history_{employee_id}_{days}_{limit}"
+    
+    # Try to get from cache first
+    cached_result = cache.get(cache_key)
+    if cached_result:
+        logger.info(f"Returning cached stress history for {employee_id}")
+        return cached_result
+    
     try:
-        # Get stress readings from database
-        from app.db.mongodb import stress_readings_collection
-        from datetime import datetime, timedelta
-        
         # Calculate date range
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
-        
-        # Query database
-        readings = list(stress_readings_collection.find({
+        query = {
             "employee_id": employee_id,
             "timestamp": {"$gte": start_date, "$lte": end_date}
-        }).sort("timestamp", -1))
+        }
         
-        # Clean MongoDB _id from results and convert datetimes to strings
-        for reading in readings:
-            if "_id" in reading:
-                reading.pop("_id")
-            # Convert datetime to ISO format string
-            if "timestamp" in reading and isinstance(reading["timestamp"], datetime):
-                reading["timestamp"] = reading["timestamp"].isoformat() + "Z"
+        # Count readings per day and level in the database (one row per day/level)
+        day_counts = {}
+        for row in stress_readings_collection.aggregate([
+            {"$match": query},
+            {"$group": {
+                "_id": {
+                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                    "level": "$stress_level"
+                },
+                "count": {"$sum": 1}
+            }}
+        ]):
+            date = row["_id"]["date"]
+            counts = day_counts.get(date)
+            if counts is None:
+                counts = day_counts[date] = {"count": 0, "stress_levels": {"Low": 0, "Medium": 0, "High": 0}}
+            counts["count"] += row["count"]
+            level = row["_id"].get("level")
+            if level in counts["stress_levels"]:
+                counts["stress_levels"][level] += row["count"]
+        
+        # Most recent individual readings, with timestamps formatted as ISO
+        # strings by the database so the result is JSON (and cache) ready
+        readings = list(stress_readings_collection.aggregate([
+            {"$match": query},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": limit},
+            {"$project": {"_id": 0}},
+            {"$addFields": {"timestamp": {"$cond": [
+                {"$eq": [{"$type": "$timestamp"}, "date"]},
+                {"$dateToString": {"format": "%Y-%m-%dT%H:%M:%S.%LZ", "date": "$timestamp"}},
+                "$timestamp"
+            ]}}}
+        ]))
         
         # Create daily summaries
         daily_summaries = []
         current_date = start_date.date()
         while current_date <= end_date.date():
-            next_date = current_date + timedelta(days=1)
-            
-            # Filter readings for the current day
-            day_readings = [
-                r for r in readings 
-                if current_date <= datetime.fromisoformat(r["timestamp"].replace('Z', '')).date() < next_date
-            ]
+            counts = day_counts.get(current_date.isoformat())
+            stress_counts = counts["stress_levels"] if counts else {"Low": 0, "Medium": 0, "High": 0}
             
-            # Calculate stress level counts
-            stress_counts = {"Low": 0, "Medium": 0, "High": 0}
-            for r in day_readings:
-                level = r.get("stress_level")
-                if level in stress_counts:
-                    stress_counts[level] += 1
-            
-            # Determine dominant stress level
+            # Determine dominant stress level (first level wins ties, Low when empty)
             dominant_level = "Low"
             max_count = 0
             for level, count in stress_counts.items():
@@ -160,22 +180,27 @@ async def get_employee_stress_history(
             # Create summary
             summary = {
                 "date": current_date.isoformat(),
-                "reading_count": len(day_readings),
+                "reading_count": counts["count"] if counts else 0,
                 "stress_levels": stress_counts,
                 "dominant_level": dominant_level
             }
             daily_summaries.append(summary)
             
             # Move to next day
-            current_date = next_date
+            current_date += timedelta(days=1)
         
-        return {
+        result = {
             "employee_id": employee_id,
             "days": days,
             "readings": readings,
             "daily_summaries": daily_summaries
         }
         
+        # Cache for 30 seconds; cleared when a new stress record is created
+        cache.set(cache_key, result, 30)
+        
+        return result
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -1,33 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Any, Iterator, Optional, Dict
 from app.schemas.schemas import JournalEntry, User
 from app.db.mongodb import journal_collection
+from app.db.journal_writer import journal_writer
 from app.core.security.deps import get_current_employee, get_current_manager
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Only the JournalEntry fields are read back
+JOURNAL_ENTRY_FIELDS = {"_id": 0, "mood": 1, "note": 1, "stressLevel": 1, "timestamp": 1}
+
+def _stream_json_array(first: Optional[Dict[str, Any]], cursor) -> Iterator[bytes]:
+    """Encode documents from a cursor as a JSON array, one at a time"""
+    if first is None:
+        yield b"[]"
+        return
+    yield b"[" + orjson.dumps(first)
+    for doc in cursor:
+        yield b"," + orjson.dumps(doc)
+    yield b"]"
+
 @router.get("/", response_model=List[JournalEntry])
-async def get_journal_entries(
+def get_journal_entries(
+    limit: int = Query(100, ge=1, le=500),
     current_user: User = Depends(get_current_employee)
 ) -> Any:
     """
-    Get all journal entries for the current employee
+    Get the most recent journal entries for the current employee
     """
     employee_id = current_user.get("employee_id")
     if not employee_id:
         raise HTTPException(status_code=404, detail="No employee profile associated with this user")
     
     try:
-        entries = list(journal_collection.find({"employee_id": employee_id}, {'_id': 0}))
-        return entries
+        cursor = (
+            journal_collection.find({"employee_id": employee_id}, JOURNAL_ENTRY_FIELDS)
+            .sort("timestamp", -1)
+            .limit(limit)
+        )
+        # Fetch the first batch here so database errors surface before streaming starts
+        first = next(cursor, None)
     except Exception as e:
         logger.error(f"Error loading journal entries from DB: {str(e)}")
         return []
+    
+    # Entries are encoded straight from the cursor instead of being collected
+    # into a list and re-validated against the response model
+    return StreamingResponse(_stream_json_array(first, cursor), media_type="application/json")
 
-@router.post("/", response_model=JournalEntry)
+@router.post("/", response_model=None)
 async def create_journal_entry(
     entry: JournalEntry,
     current_user: User = Depends(get_current_employee)
@@ -39,11 +65,12 @@ async def create_journal_entry(
     if not employee_id:
         raise HTTPException(status_code=404, detail="No employee profile associated with this user")
     
-    entry_data = entry.dict()
-    entry_data["employee_id"] = employee_id
+    entry_data = entry.model_dump(mode='json')
     
     try:
-        journal_collection.insert_one(entry_data)
+        # Queued and written in batches; the stored copy carries the owner
+        # (and gets an _id), the response is the already-validated entry
+        await journal_writer.put({**entry_data, "employee_id": employee_id})
         return entry_data
     except Exception as e:
         logger.error(f"Error saving journal entry to DB: {str(e)}")
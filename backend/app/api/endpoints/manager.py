@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from app.schemas.schemas import (
     User, LatestStressRecord, StressRecord, Command, CommandCreate,
     StressAggregateResponse, TimeseriesPoint, AggregateStats, DepartmentStats
@@ -19,45 +19,31 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Seconds to cache /stress/aggregate responses for open and already-finished date ranges
+AGGREGATE_CACHE_TTL = 60
+AGGREGATE_PAST_CACHE_TTL = 3600
+
+def validate_date_param(name: str, value: Optional[str]) -> Optional[str]:
+    """Reject a date query parameter that is not ISO 8601"""
+    if value is not None:
+        try:
+            datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid {name}: expected an ISO 8601 date"
+            )
+    return value
+
 @router.get("/employees", response_model=List[dict])
-async def get_all_employees_endpoint(
+def get_all_employees_endpoint(
     current_user: User = Depends(get_current_manager)
 ):
     """Get a list of all active employees (manager only)"""
-    employees = get_all_employees()
-    
-    # Clean MongoDB _id from results
-    for employee in employees:
-        if "_id" in employee:
-            employee.pop("_id")
-    
-    return employees
-
-@router.get("/employee/{employee_id}", response_model=dict)
-async def get_employee_details(
-    employee_id: str,
-    current_user: User = Depends(get_current_manager)
-) -> Any:
-    '''
-    Get detailed information about a specific employee (manager only)
-    '''
-    # Get employee details
-    employee = get_employee(employee_id)
-    
-    if not employee:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Employee not found"
-        )
-    
-    # Clean MongoDB _id
-    if "_id" in employee:
-        employee.pop("_id")
-        
-    return employee
+    return get_all_employees()
 
 @router.get("/employee/{employee_id}", response_model=dict)
-async def get_employee_details(
+def get_employee_details(
     employee_id: str,
     current_user: User = Depends(get_current_manager)
 ) -> Any:
@@ -73,20 +59,17 @@ async def get_employee_details(
             detail="Employee not found"
         )
     
-    # Clean MongoDB _id
-    if "_id" in employee:
-        employee.pop("_id")
-        
     return employee
 
 @router.get("/stress/latest", response_model=List[LatestStressRecord])
-async def get_latest_stress_all_employees(
+def get_latest_stress_all_employees(
+    limit: int = Query(200, ge=1, le=1000),
     current_user: User = Depends(get_current_manager)
 ) -> Any:
     """
-    Get the latest stress record for each active employee (manager only)
+    Get the latest stress record for each active employee, up to `limit` employees (manager only)
     """
-    cache_key = "latest_stress_all_employees"
+    cache_key = f"latest_stress_all_employees_{limit}"
 
     # Try to get from cache first
     cached_result = cache.get(cache_key)
@@ -94,27 +77,8 @@ async def get_latest_stress_all_employees(
         logger.info("Returning cached latest stress data")
         return cached_result
 
-    # Get latest stress records from database
-    latest_records = get_latest_stress_for_all_employees()
-
-    # Format the response
-    result = []
-    for record in latest_records:
-        # Get employee details
-        employee = get_employee(record["employee_id"])
-        if not employee or not employee.get("active", True):
-            continue
-
-        result.append({
-            "employee_id": record["employee_id"],
-            "display_name": employee["display_name"],
-            "department": employee.get("department", "N/A"),
-            "latest_stress_level": record["stress_level"],
-            "latest_emotion": record["emotion"],
-            "confidence": record["confidence"],
-            "timestamp": record["timestamp"],
-            "device_id": record["device_id"]
-        })
+    # Latest record per employee, joined with active employees in one aggregation
+    result = get_latest_stress_for_all_employees(limit)
 
     # Cache the result for 30 seconds
     cache.set(cache_key, result, 30)
@@ -123,7 +87,7 @@ async def get_latest_stress_all_employees(
     return result
 
 @router.get("/stress/history/{employee_id}", response_model=List[StressRecord])
-async def get_employee_stress_history(
+def get_employee_stress_history(
     employee_id: str,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
@@ -133,23 +97,20 @@ async def get_employee_stress_history(
     """
     Get stress history for a specific employee (manager only)
     """
-    # Verify employee exists
-    employee = get_employee(employee_id)
-    if not employee:
-        raise HTTPException(status_code=404, detail="Employee not found")
+    validate_date_param("from_date", from_date)
+    validate_date_param("to_date", to_date)
     
     # Get stress records with date filtering
     records = get_stress_records_by_employee(employee_id, from_date, to_date, limit)
     
-    # Clean MongoDB _id from results
-    for record in records:
-        if "_id" in record:
-            record.pop("_id")
+    # Records imply the employee exists; only an empty result needs the check
+    if not records and not get_employee(employee_id):
+        raise HTTPException(status_code=404, detail="Employee not found")
     
     return records
 
 @router.get("/stress/aggregate", response_model=StressAggregateResponse)
-async def get_stress_aggregates(
+def get_stress_aggregates(
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
     group_by: str = Query("day", regex="^(day|week|department)$"),
@@ -158,6 +119,18 @@ async def get_stress_aggregates(
     """
     Get stress level aggregates with optional grouping (manager only)
     """
+    # Validated once up front, before they become part of the cache key and query
+    validate_date_param("from_date", from_date)
+    validate_date_param("to_date", to_date)
+    
+    cache_key = f"stress_aggregate_{from_date}_{to_date}_{group_by}"
+    
+    # Try to get from cache first
+    cached_result = cache.get(cache_key)
+    if cached_result:
+        logger.info("Returning cached stress aggregates")
+        return cached_result
+    
     # Build query for date range
     query = {}
     if from_date or to_date:
@@ -167,50 +140,24 @@ async def get_stress_aggregates(
         if to_date:
             query["timestamp"]["$lte"] = to_date
     
-    # Get total counts by stress level
-    pipeline = [
-        {"$match": query},
-        {"$group": {
-            "_id": "$stress_level",
-            "count": {"$sum": 1}
-        }}
-    ]
-    
-    stress_counts = list(stress_records_collection.aggregate(pipeline))
-    
-    # Initialize counts
-    high_count = 0
-    medium_count = 0
-    low_count = 0
-    
-    # Extract counts from results
-    for item in stress_counts:
-        if item["_id"] == "High":
-            high_count = item["count"]
-        elif item["_id"] == "Medium":
-            medium_count = item["count"]
-        elif item["_id"] == "Low":
-            low_count = item["count"]
-    
-    total_count = high_count + medium_count + low_count
-    
-    # Calculate percentages
-    high_pct = (high_count / total_count) * 100 if total_count > 0 else 0
-    medium_pct = (medium_count / total_count) * 100 if total_count > 0 else 0
-    low_pct = (low_count / total_count) * 100 if total_count > 0 else 0
-    
-    # Build time series data
-    timeseries = []
-    daily_trend = []
-    
-    if group_by == "day":
-        # Group by day
-        pipeline = [
-            {"$match": query},
+    # Per-day or per-week counts for those views; the department view needs its own totals
+    facets = {}
+    if group_by in ("day", "week"):
+        bucket = {"$substr": ["$timestamp", 0, 10]}  # YYYY-MM-DD
+        if group_by == "week":
+            # Date of the Monday that starts the record's ISO week
+            day = {"$dateFromString": {"dateString": bucket}}
+            bucket = {"$dateToString": {
+                "format": "%Y-%m-%d",
+                "date": {"$subtract": [
+                    day,
+                    {"$multiply": [{"$subtract": [{"$isoDayOfWeek": day}, 1]}, 24 * 60 * 60 * 1000]}
+                ]}
+            }}
+        
+        facets["timeline"] = [
             {"$group": {
-                "_id": {
-                    "$substr": ["$timestamp", 0, 10]  # YYYY-MM-DD
-                },
+                "_id": bucket,
                 "high_count": {
                     "$sum": {"$cond": [{"$eq": ["$stress_level", "High"]}, 1, 0]}
                 },
@@ -222,133 +169,120 @@ async def get_stress_aggregates(
                 },
                 "total": {"$sum": 1}
             }},
+            # Stress score (0-100): full weight for High, half weight for Medium
+            {"$addFields": {
+                "stress_score": {"$cond": [
+                    {"$gt": ["$total", 0]},
+                    {"$divide": [
+                        {"$add": [{"$multiply": ["$high_count", 100]}, {"$multiply": ["$medium_count", 50]}]},
+                        "$total"
+                    ]},
+                    0
+                ]}
+            }},
             {"$sort": {"_id": 1}}
         ]
-        
-        daily_data = list(stress_records_collection.aggregate(pipeline))
-        
-        # Build daily trend data for frontend
-        daily_trend = []
-        for day in daily_data:
-            daily_trend.append({
-                "date": day["_id"],
-                "Low": day.get("low_count", 0),
-                "Medium": day.get("medium_count", 0),
-                "High": day.get("high_count", 0)
-            })
-        
-        for day in daily_data:
-            # Calculate stress score (0-100)
-            # Higher weight to High stress, medium weight to Medium stress
-            stress_score = 0
-            if day["total"] > 0:
-                stress_score = ((day["high_count"] * 100) + (day["medium_count"] * 50)) / day["total"]
-            
-            timeseries.append({
-                "timestamp": f"{day['_id']}T00:00:00Z",
-                "value": stress_score
-            })
-    
-    elif group_by == "week":
-        # Use MongoDB date operators to group by week
-        # This is a simplified approach - in a real system you'd use 
-        # MongoDB's date operators for accurate week calculations
-        pipeline = [
-            {"$match": query},
+    elif group_by == "department":
+        # Total counts by stress level
+        facets["overall"] = [
             {"$group": {
-                "_id": {
-                    "$substr": ["$timestamp", 0, 10]  # YYYY-MM-DD (we'll aggregate by week in Python)
-                },
-                "high_count": {
-                    "$sum": {"$cond": [{"$eq": ["$stress_level", "High"]}, 1, 0]}
-                },
-                "medium_count": {
-                    "$sum": {"$cond": [{"$eq": ["$stress_level", "Medium"]}, 1, 0]}
-                },
-                "low_count": {
-                    "$sum": {"$cond": [{"$eq": ["$stress_level", "Low"]}, 1, 0]}
-                },
-                "total": {"$sum": 1}
-            }},
-            {"$sort": {"_id": 1}}
+                "_id": "$stress_level",
+                "count": {"$sum": 1}
+            }}
         ]
+        # Counts per employee and level; rolled up into departments below
+        facets["by_employee"] = [
+            {"$group": {
+                "_id": {"employee_id": "$employee_id", "level": "$stress_level"},
+                "count": {"$sum": 1}
+            }}
+        ]
+    
+    # Single pass over the matched records for all views
+    facet_result = next(stress_records_collection.aggregate([
+        {"$match": query},
+        {"$facet": facets}
+    ]))
+    
+    if "timeline" in facet_result:
+        # The buckets partition the matched records, so their counts sum to the totals
+        high_count = sum(bucket["high_count"] for bucket in facet_result["timeline"])
+        medium_count = sum(bucket["medium_count"] for bucket in facet_result["timeline"])
+        low_count = sum(bucket["low_count"] for bucket in facet_result["timeline"])
+    else:
+        # Initialize counts
+        high_count = 0
+        medium_count = 0
+        low_count = 0
         
-        daily_data = list(stress_records_collection.aggregate(pipeline))
-        
-        # Group days into weeks
-        weekly_data = {}
-        for day in daily_data:
-            date_obj = datetime.strptime(day["_id"], "%Y-%m-%d")
-            year, week_num, _ = date_obj.isocalendar()
-            week_key = f"{year}-W{week_num:02d}"
-            
-            if week_key not in weekly_data:
-                weekly_data[week_key] = {
-                    "high_count": 0,
-                    "medium_count": 0,
-                    "low_count": 0,
-                    "total": 0,
-                    "start_date": date_obj - timedelta(days=date_obj.weekday())  # Monday
-                }
-            
-            weekly_data[week_key]["high_count"] += day["high_count"]
-            weekly_data[week_key]["medium_count"] += day["medium_count"]
-            weekly_data[week_key]["low_count"] += day["low_count"]
-            weekly_data[week_key]["total"] += day["total"]
+        # Extract counts from results
+        for item in facet_result["overall"]:
+            if item["_id"] == "High":
+                high_count = item["count"]
+            elif item["_id"] == "Medium":
+                medium_count = item["count"]
+            elif item["_id"] == "Low":
+                low_count = item["count"]
+    
+    total_count = high_count + medium_count + low_count
+    
+    # Calculate percentages
+    high_pct = (high_count / total_count) * 100 if total_count > 0 else 0
+    medium_pct = (medium_count / total_count) * 100 if total_count > 0 else 0
+    low_pct = (low_count / total_count) * 100 if total_count > 0 else 0
+    
+    # Build time series data
+    timeseries = []
+    daily_trend = []
+    
+    # Day buckets are YYYY-MM-DD, week buckets are the date of their Monday
+    for bucket in facet_result.get("timeline", []):
+        timeseries.append({
+            "timestamp": f"{bucket['_id']}T00:00:00Z",
+            "value": bucket["stress_score"]
+        })
         
-        # Convert to timeseries
-        for week_key, data in sorted(weekly_data.items()):
-            # Calculate stress score
-            stress_score = 0
-            if data["total"] > 0:
-                stress_score = ((data["high_count"] * 100) + (data["medium_count"] * 50)) / data["total"]
-            
-            timeseries.append({
-                "timestamp": data["start_date"].strftime("%Y-%m-%dT00:00:00Z"),
-                "value": stress_score
+        if group_by == "day":
+            # Daily trend data for frontend
+            daily_trend.append({
+                "date": bucket["_id"],
+                "Low": bucket.get("low_count", 0),
+                "Medium": bucket.get("medium_count", 0),
+                "High": bucket.get("high_count", 0)
             })
     
     # Department statistics (if requested)
     department_stats = []
     if group_by == "department":
-        # Get all active employees with their departments
-        employees = get_all_employees(active_only=True)
+        # Get all active employees with their departments (answered from the index alone)
+        employees = get_all_employees(
+            active_only=True,
+            projection={"_id": 0, "employee_id": 1, "department": 1}
+        )
         
-        # Group employees by department
-        dept_employees = {}
+        # Map employees to departments; departments keep the order they first appear in
+        employee_departments = {}
+        dept_counts = {}
         for emp in employees:
-            dept = emp.get("department", "Unassigned")
-            if dept not in dept_employees:
-                dept_employees[dept] = []
-            dept_employees[dept].append(emp["employee_id"])
+            dept = emp.get("department")
+            if dept is None:
+                dept = "Unassigned"
+            employee_departments[emp["employee_id"]] = dept
+            if dept not in dept_counts:
+                dept_counts[dept] = {"High": 0, "Medium": 0, "Low": 0}
+        
+        # Add each employee's level counts to their department
+        for item in facet_result["by_employee"]:
+            dept = employee_departments.get(item["_id"].get("employee_id"))
+            level = item["_id"].get("level")
+            if dept is not None and level in dept_counts[dept]:
+                dept_counts[dept][level] += item["count"]
         
         # For each department, calculate stress level percentages
-        for dept, emp_ids in dept_employees.items():
-            dept_query = query.copy()
-            dept_query["employee_id"] = {"$in": emp_ids}
-            
-            pipeline = [
-                {"$match": dept_query},
-                {"$group": {
-                    "_id": "$stress_level",
-                    "count": {"$sum": 1}
-                }}
-            ]
-            
-            dept_stress = list(stress_records_collection.aggregate(pipeline))
-            
-            # Initialize counts
-            dept_high = 0
-            dept_medium = 0
-            dept_low = 0
-            
-            for item in dept_stress:
-                if item["_id"] == "High":
-                    dept_high = item["count"]
-                elif item["_id"] == "Medium":
-                    dept_medium = item["count"]
-                elif item["_id"] == "Low":
-                    dept_low = item["count"]
+        for dept, counts in dept_counts.items():
+            dept_high = counts["High"]
+            dept_medium = counts["Medium"]
+            dept_low = counts["Low"]
             
             dept_total = dept_high + dept_medium + dept_low
             
@@ -387,6 +321,13 @@ async def get_stress_aggregates(
     if department_stats:
         response["departments"] = department_stats
     
+    # Ranges that ended before today only change when a late reading arrives, which
+    # clears these keys in create_stress_record, so they are kept longer
+    if to_date and to_date[:10] < datetime.utcnow().date().isoformat():
+        cache.set(cache_key, response, AGGREGATE_PAST_CACHE_TTL)
+    else:
+        cache.set(cache_key, response, AGGREGATE_CACHE_TTL)
+    
     return response
 
 
@@ -423,7 +364,7 @@ async def get_stress_aggregates_test(
 
 
 @router.post("/trigger/{employee_id}", response_model=Command)
-async def trigger_analyze_for_employee(
+def trigger_analyze_for_employee(
     employee_id: str,
     current_user: User = Depends(get_current_manager)
 ) -> Any:
@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, Tuple
+from collections import OrderedDict
 from app.models.models import process_image_for_stress
 from app.schemas.schemas import ImageData, StressRecord
+from app.core.security.deps import limiter
+import hashlib
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Clients resubmitting the same frame in quick succession get the result already
+# computed for it within this window (seconds); keyed by client and image digest
+COALESCE_WINDOW = 0.5
+MAX_COALESCED_RESULTS = 1024
+_recent_results: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
 @router.post("/predict-stress", response_model=Dict[str, Any])
-async def predict_stress(data: ImageData) -> Dict[str, Any]:
+@limiter.limit("5/second")
+async def predict_stress(request: Request, data: ImageData) -> Dict[str, Any]:
     """
     Process an image directly to predict stress levels
     This endpoint maintains compatibility with the original API
@@ -21,12 +33,23 @@ async def predict_stress(data: ImageData) -> Dict[str, Any]:
                 detail="No image data provided"
             )
         
+        client = request.client.host if request.client else "unknown"
+        image_digest = hashlib.blake2b(data.image.encode(), digest_size=16).hexdigest()
+        coalesce_key = f"{client}:{image_digest}"
+        recent = _recent_results.get(coalesce_key)
+        if recent is not None and time.monotonic() - recent[0] < COALESCE_WINDOW:
+            logger.debug(f"Returning coalesced prediction for {client}")
+            return recent[1]
+        
         # Process the image (no device/employee auth for direct API)
         # This is for backward compatibility with the original API
         device_id = "direct-api"
         employee_id = "api-user"
         
-        result = process_image_for_stress(
+        # Decoding and CNN inference are CPU-bound; run them in the threadpool
+        # so they don't block the event loop for other requests
+        result = await run_in_threadpool(
+            process_image_for_stress,
             data.image,
             device_id,
             employee_id
@@ -38,6 +61,11 @@ async def predict_stress(data: ImageData) -> Dict[str, Any]:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=result["error"]
             )
+        
+        _recent_results[coalesce_key] = (time.monotonic(), result)
+        _recent_results.move_to_end(coalesce_key)
+        if len(_recent_results) > MAX_COALESCED_RESULTS:
+            _recent_results.popitem(last=False)
             
         return result
         
@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Depends
 from typing import Dict, Any
 from app.core.config import settings
+from app.db.mongodb import (
+    users_collection, employees_collection,
+    devices_collection, stress_records_collection
+)
 import logging
 import platform
 import psutil
@@ -22,7 +26,7 @@ async def health_check() -> Dict[str, Any]:
     }
 
 @router.get("/metrics")
-async def metrics() -> Dict[str, Any]:
+def metrics() -> Dict[str, Any]:
     """
     Simple metrics endpoint
     """
@@ -32,34 +36,36 @@ async def metrics() -> Dict[str, Any]:
         disk = psutil.disk_usage('/')
         
         # Server metrics
-        from app.db.mongodb import (
-            users_collection, employees_collection,
-            devices_collection, stress_records_collection
-        )
-        
-        # Get counts
         user_count = users_collection.count_documents({})
         employee_count = employees_collection.count_documents({"active": True})
         device_count = devices_collection.count_documents({"active": True})
         
-        # Get stress counts by level for today
-        today = datetime.utcnow().strftime("%Y-%m-%d")
-        high_stress = stress_records_collection.count_documents({
-            "timestamp": {"$regex": f"^{today}"},
-            "stress_level": "High"
-        })
+        # Today's counts by level and the weekly total in a single pass over the last
+        # week; ISO timestamps sort as strings, so date prefix ranges use the timestamp index
+        today = datetime.utcnow().date()
+        week_ago = (today - timedelta(days=7)).isoformat()
+        stress_stats = next(stress_records_collection.aggregate([
+            {"$match": {"timestamp": {"$gte": week_ago}}},
+            {"$facet": {
+                "today": [
+                    {"$match": {"timestamp": {
+                        "$gte": today.isoformat(),
+                        "$lt": (today + timedelta(days=1)).isoformat()
+                    }}},
+                    {"$group": {"_id": "$stress_level", "count": {"$sum": 1}}}
+                ],
+                "weekly": [{"$count": "count"}]
+            }}
+        ]))
         
-        total_today = stress_records_collection.count_documents({
-            "timestamp": {"$regex": f"^{today}"}
-        })
+        today_counts = {item["_id"]: item["count"] for item in stress_stats["today"]}
+        high_stress = today_counts.get("High", 0)
+        total_today = sum(today_counts.values())
         
         high_pct = (high_stress / total_today * 100) if total_today > 0 else 0
         
         # Total records in the last week
-        week_ago = (datetime.utcnow() - timedelta(days=7)).strftime("%Y-%m-%d")
-        weekly_records = stress_records_collection.count_documents({
-            "timestamp": {"$gte": week_ago}
-        })
+        weekly_records = stress_stats["weekly"][0]["count"] if stress_stats["weekly"] else 0
         
         return {
             "system": {
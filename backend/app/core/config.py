@@ -1,4 +1,5 @@
 from typing import List, Optional
+from urllib.parse import quote
 import os
 from dotenv import load_dotenv
 
@@ -21,17 +22,31 @@ class Settings:
     # MongoDB Settings
     MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://127.0.0.1:27017/")
     DB_NAME: str = os.getenv("DB_NAME", "stress_sense_db")
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000"))
+    MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "2000"))
+    MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "5000"))
+    # How long a request waits for a free pooled connection before failing
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+    # Comma-separated wire compressors, e.g. "zstd,snappy,zlib" (zstd/snappy need extra packages)
+    MONGO_COMPRESSORS: str = os.getenv("MONGO_COMPRESSORS", "")
     # JWT Settings
     JWT_SECRET: str = os.getenv("JWT_SECRET", "insecure_jwt_secret_change_this_in_production")
     JWT_EXPIRES_MINUTES: int = int(os.getenv("JWT_EXPIRES_MINUTES", "60"))
     # Security Settings
-    PASSWORD_HASH_SCHEME: str = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+    PASSWORD_HASH_SCHEME: str = os.getenv("PASSWORD_HASH_SCHEME", "argon2")
     DEVICE_KEY_PEPPER: str = os.getenv("DEVICE_KEY_PEPPER", "insecure_pepper_change_this_in_production")
     # CORS Settings
     ALLOWED_ORIGINS: List[str] = []
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Extra debug-only checks (e.g. device registration self-test)
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+    
+    # Worker threads for blocking work offloaded from the event loop
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", "40"))
     
     # Stress level suggestions
     STRESS_SUGGESTIONS: dict = {
@@ -54,6 +69,10 @@ class Settings:
             "Take a break and do something you enjoy"
         ]
     }
+    # Every suggestion, shown when an employee has no stress record yet
+    STRESS_SUGGESTIONS_ALL: list = [
+        item for items in STRESS_SUGGESTIONS.values() for item in items
+    ]
     
     # Redis Settings
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
@@ -64,6 +83,10 @@ class Settings:
     REDIS_DECODE_RESPONSES: bool = os.getenv("REDIS_DECODE_RESPONSES", "False").lower() == "true"
     REDIS_CACHE_TTL: int = int(os.getenv("REDIS_CACHE_TTL", "30"))  # seconds
     
+    # Rate limit counters live in Redis so limits hold across workers and restarts;
+    # defaults to the Redis settings above when not set
+    RATE_LIMIT_STORAGE_URI: str = os.getenv("RATE_LIMIT_STORAGE_URI", "")
+    
     # Privacy Banner
     PRIVACY_BANNER: str = (
         "StressSense only stores processed stress data, not raw images or video. "
@@ -74,5 +97,10 @@ class Settings:
         allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000")
         if allowed_origins:
             self.ALLOWED_ORIGINS = allowed_origins.split(",")
+        if not self.RATE_LIMIT_STORAGE_URI:
+            credentials = ""
+            if self.REDIS_PASSWORD:
+                credentials = f"{quote(self.REDIS_USERNAME or '', safe='')}:{quote(self.REDIS_PASSWORD, safe='')}@"
+            self.RATE_LIMIT_STORAGE_URI = f"redis://{credentials}{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}"
 
 settings = Settings()
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from jose import jwt
+from typing import Optional, Dict, Any, Tuple
+from jose import jwk, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 import secrets
@@ -10,23 +10,37 @@ import hashlib
 
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=[settings.PASSWORD_HASH_SCHEME], deprecated="auto")
+# New hashes use the configured scheme; older bcrypt hashes still verify and are
+# upgraded on the next successful login
+pwd_context = CryptContext(
+    schemes=list(dict.fromkeys([settings.PASSWORD_HASH_SCHEME, "bcrypt"])),
+    deprecated="auto"
+)
+
+# JWT signing key, constructed once instead of on every encode/decode
+JWT_ALGORITHM = "HS256"
+JWT_SIGNING_KEY = jwk.construct(settings.JWT_SECRET, JWT_ALGORITHM)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash"""
+    """Verify a password against a hash (digest comparison is constant-time)"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, also returning a replacement hash if the stored one is outdated"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def dummy_verify_password() -> bool:
+    """Spend the same time as verify_password for logins with unknown usernames"""
+    return pwd_context.dummy_verify()
+
 def get_password_hash(password: str) -> str:
     """Hash a password for storing"""
     return pwd_context.hash(password)
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT token"""
-    to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.JWT_EXPIRES_MINUTES))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm="HS256")
-    return encoded_jwt
+    return jwt.encode({**data, "exp": expire}, JWT_SIGNING_KEY, algorithm=JWT_ALGORITHM)
 
 def generate_api_key(length: int = 32) -> str:
     """Generate a secure API key for devices"""
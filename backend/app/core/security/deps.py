@@ -5,13 +5,28 @@ from typing import Optional, Tuple, Dict, Any
 from datetime import datetime
 from app.core.config import settings
 from app.db.mongodb import users_collection, devices_collection
-from app.core.security.auth import verify_api_key
+from app.core.security.auth import hash_api_key, JWT_ALGORITHM, JWT_SIGNING_KEY
+from app.db.redis_cache import cache
+from app.db.last_active_writer import last_active_writer
 import logging
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-# Set up limiter for rate limiting
-limiter = Limiter(key_func=get_remote_address)
+def get_rate_limit_key(request: Request) -> str:
+    """Rate limit authenticated devices by device ID, everyone else by client address"""
+    device_id = getattr(request.state, "device_id", None)
+    if device_id:
+        return f"device:{device_id}"
+    return get_remote_address(request)
+
+# Set up limiter for rate limiting; moving windows in Redis are shared by all workers,
+# with per-process counting while Redis is unreachable
+limiter = Limiter(
+    key_func=get_rate_limit_key,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    strategy="moving-window",
+    in_memory_fallback_enabled=True
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,13 +34,16 @@ oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_PREFIX}/auth/login"
 )
 
+# Device fields handed to endpoints; kept JSON-serializable so the lookup can be cached
+DEVICE_AUTH_PROJECTION = {"_id": 0, "device_id": 1, "employee_id": 1, "device_name": 1, "active": 1, "is_admin": 1}
+
 async def get_api_key_header(
     x_device_key: Optional[str] = Header(None)
 ) -> Optional[str]:
     """Get API key from header."""
     return x_device_key
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def get_current_user(token: str = Depends(oauth2_scheme)):
     """Verify JWT token and return user data"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,17 +52,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+        payload = jwt.decode(token, JWT_SIGNING_KEY, algorithms=[JWT_ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
         
-        user = users_collection.find_one({"user_id": user_id})
+        user = users_collection.find_one({"user_id": user_id}, {"_id": 0})
         if user is None:
             raise credentials_exception
             
-        # Remove _id from MongoDB document
-        user.pop('_id', None)
         return user
     except JWTError as e:
         logger.warning(f"JWT error: {e}")
@@ -77,7 +93,7 @@ async def get_current_employee(current_user = Depends(get_current_active_user)):
         )
     return current_user
 
-async def verify_device_api_key(
+def verify_device_api_key(
     request: Request,
     api_key: Optional[str] = Depends(get_api_key_header),
     query_api_key: Optional[str] = Query(None, alias="api_key"),
@@ -88,15 +104,9 @@ async def verify_device_api_key(
     Tries both header and query parameter methods for the API key.
     """
     try:
-        # Log debug information
-        logger.debug(f"Headers received: {dict(request.headers)}")
-        logger.debug(f"API Key from header: {api_key[:4] + '...' if api_key else 'None'}")
-        logger.debug(f"API Key from query: {query_api_key[:4] + '...' if query_api_key else 'None'}")
-        
         # Use query parameter API key if header is not provided
         if not api_key and query_api_key:
             api_key = query_api_key
-            logger.debug(f"Using API key from query parameter")
         
         if not api_key:
             logger.error("No API key provided in headers or query parameters")
@@ -105,57 +115,39 @@ async def verify_device_api_key(
                 detail="API key is required",
                 headers={"WWW-Authenticate": "ApiKey"},
             )
-            
-        # Get path parameters for more context in debugging
-        path_params = request.path_params
-        device_id_from_url = path_params.get("device_id", None)
-        logger.info(f"[AUTH] Device authentication attempt")
-        logger.info(f"[AUTH] API key provided: {api_key[:8] if api_key else 'None'}...")
-        logger.info(f"[AUTH] Device ID from URL: {device_id_from_url}")
         
-        # Get all devices for debugging
-        device_list = list(devices_collection.find({}, {"device_id": 1, "api_key": 1, "active": 1}))
-        logger.debug(f"[AUTH] Found {len(device_list)} total devices in database")
-        for idx, dev in enumerate(device_list):
-            logger.debug(f"[AUTH] Device {idx+1}: ID={dev.get('device_id')}, Key={dev.get('api_key')[:6] if dev.get('api_key') else 'None'}..., Active={dev.get('active', False)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[AUTH] Device authentication attempt, key prefix: {api_key[:4]}...")
         
-        # First try to find the device with the exact API key
-        device = devices_collection.find_one({"api_key": api_key, "active": True})
+        # Devices are looked up by the peppered hash only; the plain key is never stored or compared
+        api_key_hash = hash_api_key(api_key)
+        cache_key = f"device_api_key_{api_key_hash}"
+        device = cache.get(cache_key)
         
         if not device:
-            # Try to match with the hash instead
-            from app.core.security.auth import hash_api_key
-            api_key_hash = hash_api_key(api_key)
-            device = devices_collection.find_one({"api_key_hash": api_key_hash, "active": True})
-            
-            if not device:
-                # TEMPORARY: Try to find device by device_id from config if API key matches known test key
-                test_api_key = "4aa24833bd2da363a55eac6437003651b8278e88f42e7ae4a3bd545cd4512c7d"
-                if api_key == test_api_key:
-                    device = devices_collection.find_one({"device_id": "device-b6f08f34", "active": True})
-                    if device:
-                        logger.warning(f"TEMPORARY BYPASS: Using device device-b6f08f34 for test API key")
-                        return device
-                
-                logger.error(f"[AUTH] No device found with API key hash: {api_key_hash[:6]}...")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid API key",
-                    headers={"WWW-Authenticate": "ApiKey"},
-                )
-            else:
-                logger.info(f"[AUTH] Device found using API key hash: {device.get('device_id')}")
-        else:
-            logger.info(f"[AUTH] Device found using plain API key: {device.get('device_id')}")
+            # Only known keys are cached; misses always go to the database
+            device = devices_collection.find_one({"api_key_hash": api_key_hash, "active": True}, DEVICE_AUTH_PROJECTION)
+            if device:
+                cache.set(cache_key, device, settings.REDIS_CACHE_TTL)
         
-        # Update last active
-        devices_collection.update_one(
-            {"_id": device["_id"]},
-            {"$set": {"last_active": datetime.utcnow()}}
-        )
+        if not device:
+            logger.error(f"[AUTH] No device found with API key hash: {api_key_hash[:6]}...")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key",
+                headers={"WWW-Authenticate": "ApiKey"},
+            )
+        
+        # Rate limits on device endpoints are counted per device
+        request.state.device_id = device["device_id"]
+        
+        # Update last active (written in batches by the background writer)
+        last_active_writer.touch(device["device_id"], datetime.utcnow())
         
-        logger.info(f"[AUTH] Authentication successful for device: {device.get('device_id')}")
+        logger.debug(f"[AUTH] Authentication successful for device: {device['device_id']}")
         return device
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in verify_device_api_key: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.db.mongodb import journal_collection
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() after the last entry to write
+_STOP = object()
+
+class JournalWriter:
+    """Queue journal entries and write them to MongoDB in batches"""
+
+    def __init__(self, collection, flush_interval: float = 0.1, max_batch: int = 500):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the background flush task on the running event loop"""
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+        logger.info("Journal writer started")
+
+    async def stop(self):
+        """Stop the flush task once it has written everything already queued"""
+        if self.task is None:
+            return
+        # Entries put from here on are inserted directly; the flush task writes
+        # its in-flight batch and the rest of the queue before it reaches _STOP
+        task, self.task = self.task, None
+        await self.queue.put(_STOP)
+        await task
+        logger.info("Journal writer stopped")
+
+    async def put(self, entry: Dict[str, Any]):
+        """Queue an entry for insertion, or insert it directly if not started"""
+        if self.task is None:
+            await run_in_threadpool(self.collection.insert_one, entry)
+            return
+        await self.queue.put(entry)
+
+    async def _run(self):
+        while True:
+            entry = await self.queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            # Give concurrent requests a moment to join this batch
+            await asyncio.sleep(self.flush_interval)
+            stopping = False
+            while len(batch) < self.max_batch and not self.queue.empty():
+                entry = self.queue.get_nowait()
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        try:
+            await run_in_threadpool(self.collection.insert_many, batch, ordered=False)
+            logger.debug(f"Wrote {len(batch)} journal entries")
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} journal entries to DB: {str(e)}")
+
+# Global journal writer instance
+journal_writer = JournalWriter(journal_collection)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from pymongo import UpdateOne
+from app.db.mongodb import devices_collection
+
+logger = logging.getLogger(__name__)
+
+class LastActiveWriter:
+    """Collect device last_active timestamps and write them to MongoDB in batches"""
+
+    def __init__(self, collection, flush_interval: float = 5.0):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        # Called from threadpool workers, so guarded by a thread lock
+        self.lock = threading.Lock()
+        self.buffer: Dict[str, datetime] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the background flush task on the running event loop"""
+        self.task = asyncio.create_task(self._run())
+        logger.info("Last active writer started")
+
+    async def stop(self):
+        """Stop the flush task and write out any pending timestamps"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        await run_in_threadpool(self._flush)
+        logger.info("Last active writer stopped")
+
+    def touch(self, device_id: str, timestamp: datetime):
+        """Record device activity; only the latest timestamp per device is written"""
+        if self.task is None:
+            self.collection.update_one(
+                {"device_id": device_id},
+                {"$set": {"last_active": timestamp}}
+            )
+            return
+        with self.lock:
+            self.buffer[device_id] = timestamp
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await run_in_threadpool(self._flush)
+
+    def _flush(self):
+        with self.lock:
+            pending, self.buffer = self.buffer, {}
+        if not pending:
+            return
+        try:
+            self.collection.bulk_write(
+                [
+                    UpdateOne({"device_id": device_id}, {"$set": {"last_active": timestamp}})
+                    for device_id, timestamp in pending.items()
+                ],
+                ordered=False
+            )
+            logger.debug(f"Updated last_active for {len(pending)} devices")
+        except Exception as e:
+            logger.error(f"Error updating last_active for {len(pending)} devices: {str(e)}")
+
+# Global last active writer instance
+last_active_writer = LastActiveWriter(devices_collection)
@@ -1,12 +1,26 @@
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
 from app.core.config import settings
+from app.core.security.auth import hash_api_key
 import logging
 
 logger = logging.getLogger(__name__)
 
 try:
-    client = MongoClient(settings.MONGO_URI)
+    # Single shared, pooled client; short timeouts so an unavailable server
+    # fails requests fast instead of stalling them for the 30 s default
+    client_options = dict(
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        retryWrites=True,
+    )
+    if settings.MONGO_COMPRESSORS:
+        client_options["compressors"] = settings.MONGO_COMPRESSORS
+    client = MongoClient(settings.MONGO_URI, **client_options)
     db = client[settings.DB_NAME]
     
     # Collections
@@ -24,22 +38,40 @@ try:
     
     employees_collection.create_index("employee_id", unique=True)
     employees_collection.create_index("department")
+    # Covers the active employee -> department lookup of the manager aggregate
+    employees_collection.create_index([("active", 1), ("employee_id", 1), ("department", 1)])
     
     devices_collection.create_index("device_id", unique=True)
     devices_collection.create_index("device_number", unique=True)
     devices_collection.create_index("employee_id")
     devices_collection.create_index("active")
+    devices_collection.create_index([("employee_id", 1), ("device_type", 1)])
+    devices_collection.create_index(
+        "api_key_hash",
+        unique=True,
+        partialFilterExpression={"api_key_hash": {"$type": "string"}}
+    )
+    # Older registrations also stored the plain API key; keep only its hash
+    for legacy in devices_collection.find({"api_key": {"$exists": True}}, {"api_key": 1, "api_key_hash": 1}):
+        update = {"$unset": {"api_key": ""}}
+        if legacy.get("api_key") and not legacy.get("api_key_hash"):
+            update["$set"] = {"api_key_hash": hash_api_key(legacy["api_key"])}
+        devices_collection.update_one({"_id": legacy["_id"]}, update)
     
     stress_records_collection.create_index([("employee_id", 1), ("timestamp", 1)])
-    stress_records_collection.create_index("timestamp")
+    # Serves the manager aggregate's timestamp range and holds every field it groups on
+    stress_records_collection.create_index([("timestamp", 1), ("stress_level", 1), ("employee_id", 1)])
     
     stress_readings_collection.create_index([("employee_id", 1), ("timestamp", 1)])
     stress_readings_collection.create_index("device_id")
     stress_readings_collection.create_index("timestamp")
     
-    commands_collection.create_index("device_id")
+    commands_collection.create_index("command_id", unique=True)
+    commands_collection.create_index([("device_id", 1), ("status", 1)])
     commands_collection.create_index("status")
     
+    journal_collection.create_index([("employee_id", 1), ("timestamp", -1)])
+    
     logger.info("Connected to MongoDB and created indexes successfully")
     
     # Test connection
@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+from pymongo import ReturnDocument
 from app.schemas.schemas import (
     UserCreate, User, EmployeeCreate, Employee,
     DeviceCreate, Device, DeviceWithKey, StressSubmission,
@@ -62,9 +63,33 @@ def get_user_by_username(username: str):
     """Get a user by username"""
     return users_collection.find_one({"username": username})
 
-def get_user_by_id(user_id: str):
+# Only the fields login needs are cached
+LOGIN_USER_FIELDS = {
+    "_id": 0, "user_id": 1, "password_hash": 1, "role": 1,
+    "employee_id": 1, "active": 1, "full_name": 1, "email": 1
+}
+LOGIN_USER_CACHE_TTL = 600
+
+def get_login_user(username: str):
+    """Get the login fields for a user, cached by username"""
+    cache_key = f"login_user_{username}"
+    user = cache.get(cache_key)
+    if user:
+        return user
+    
+    user = users_collection.find_one({"username": username}, LOGIN_USER_FIELDS)
+    if user:
+        cache.set(cache_key, user, LOGIN_USER_CACHE_TTL)
+    return user
+
+def get_user_by_id(user_id: str, projection=None):
     """Get a user by ID"""
-    return users_collection.find_one({"user_id": user_id})
+    return users_collection.find_one({"user_id": user_id}, projection)
+
+def update_password_hash(user_id: str, username: str, password_hash: str):
+    """Store an upgraded password hash and drop the cached login data"""
+    users_collection.update_one({"user_id": user_id}, {"$set": {"password_hash": password_hash}})
+    cache.delete(f"login_user_{username}")
 
 def update_user(user_id: str, update_data):
     """Update a user's information"""
@@ -80,10 +105,14 @@ def update_user(user_id: str, update_data):
         update_fields["active"] = update_data.active
     
     if update_fields:
-        users_collection.update_one(
+        previous = users_collection.find_one_and_update(
             {"user_id": user_id},
-            {"$set": update_fields}
+            {"$set": update_fields},
+            projection={"_id": 0, "username": 1}
         )
+        # Drop cached login data for the old username
+        if previous:
+            cache.delete(f"login_user_{previous['username']}")
 
 # Employee operations
 def create_employee(employee_data: EmployeeCreate) -> Employee:
@@ -103,14 +132,24 @@ def create_employee(employee_data: EmployeeCreate) -> Employee:
     employees_collection.insert_one(employee_db)
     return Employee(**employee_db)
 
+EMPLOYEE_CACHE_TTL = 60
+
 def get_employee(employee_id: str):
-    """Get an employee by ID"""
-    return employees_collection.find_one({"employee_id": employee_id})
+    """Get an employee by ID, cached briefly"""
+    cache_key = f"employee_record_{employee_id}"
+    employee = cache.get(cache_key)
+    if employee:
+        return employee
+    
+    employee = employees_collection.find_one({"employee_id": employee_id}, {"_id": 0})
+    if employee:
+        cache.set(cache_key, employee, EMPLOYEE_CACHE_TTL)
+    return employee
 
-def get_all_employees(active_only: bool = True):
+def get_all_employees(active_only: bool = True, projection=None):
     """Get all employees, optionally filtering by active status"""
     query = {"active": True} if active_only else {}
-    return list(employees_collection.find(query))
+    return list(employees_collection.find(query, projection or {"_id": 0}))
 
 def update_employee(employee_id: str, update_data):
     """Update an employee's information"""
@@ -133,6 +172,7 @@ def update_employee(employee_id: str, update_data):
             {"employee_id": employee_id},
             {"$set": update_fields}
         )
+        cache.delete(f"employee_record_{employee_id}")
 
 # Device operations
 def create_device(device_data: DeviceCreate) -> DeviceWithKey:
@@ -157,7 +197,7 @@ def create_device(device_data: DeviceCreate) -> DeviceWithKey:
 
 def get_device(device_id: str):
     """Get a device by ID"""
-    return devices_collection.find_one({"device_id": device_id})
+    return devices_collection.find_one({"device_id": device_id}, {"_id": 0})
 
 def get_devices_by_employee(employee_id: str, active_only: bool = True):
     """Get all devices for an employee, optionally filtering by active status"""
@@ -165,12 +205,12 @@ def get_devices_by_employee(employee_id: str, active_only: bool = True):
     if active_only:
         query["active"] = True
     
-    return list(devices_collection.find(query))
+    return list(devices_collection.find(query, {"_id": 0}))
 
 def get_all_devices(active_only: bool = True):
     """Get all devices, optionally filtering by active status"""
     query = {"active": True} if active_only else {}
-    return list(devices_collection.find(query))
+    return list(devices_collection.find(query, {"_id": 0}))
 
 def update_device(device_id: str, update_data):
     """Update a device's information and optionally rotate API key"""
@@ -188,10 +228,14 @@ def update_device(device_id: str, update_data):
         update_fields["api_key_hash"] = hash_api_key(api_key)
     
     if update_fields:
-        devices_collection.update_one(
+        previous = devices_collection.find_one_and_update(
             {"device_id": device_id},
-            {"$set": update_fields}
+            {"$set": update_fields},
+            projection={"_id": 0, "api_key_hash": 1}
         )
+        # Drop the cached key lookup so deactivation and key rotation apply immediately
+        if previous and previous.get("api_key_hash"):
+            cache.delete(f"device_api_key_{previous['api_key_hash']}")
     
     return api_key
 
@@ -223,13 +267,15 @@ def create_stress_record(submission: StressSubmission) -> StressRecord:
         "face_quality": submission.face_quality.dict() if submission.face_quality else None
     }
     
-    logger.info(f"[DATABASE] Creating stress record: {record_db}")
     stress_records_collection.insert_one(record_db)
-    logger.info(f"[DATABASE] Stress record created successfully with ID: {record_id}")
+    logger.debug(f"[DATABASE] Stress record created with ID: {record_id}")
 
     # Clear cache for latest stress data since we have new data
-    cache.delete("latest_stress_all_employees")
+    cache.clear_pattern("latest_stress_all_employees_*")
+    cache.delete(f"latest_stress_employee_{submission.employee_id}")
     cache.clear_pattern("employee_stress_history_*")
+    # Devices may upload readings late, so even aggregates for past ranges can change
+    cache.clear_pattern("stress_aggregate_*")
     logger.info("[CACHE] Cleared latest stress data cache after new record creation")
 
     return StressRecord(**record_db)
@@ -245,32 +291,72 @@ def get_stress_records_by_employee(employee_id: str, from_date=None, to_date=Non
     elif to_date:
         query["timestamp"] = {"$lte": to_date}
     
-    return list(stress_records_collection.find(query).sort("timestamp", -1).limit(limit))
+    return list(stress_records_collection.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit))
+
+LATEST_STRESS_CACHE_TTL = 30
 
 def get_latest_stress_by_employee(employee_id: str):
-    """Get the most recent stress record for an employee"""
-    records = list(stress_records_collection.find(
-        {"employee_id": employee_id}
-    ).sort("timestamp", -1).limit(1))
-    
-    return records[0] if records else None
+    """Get the most recent stress record for an employee, cached briefly"""
+    cache_key = f"latest_stress_employee_{employee_id}"
+    record = cache.get(cache_key)
+    if record:
+        return record
+    
+    record = stress_records_collection.find_one(
+        {"employee_id": employee_id},
+        {"_id": 0},
+        sort=[("timestamp", -1)]
+    )
+    if record:
+        cache.set(cache_key, record, LATEST_STRESS_CACHE_TTL)
+    return record
 
-def get_latest_stress_for_all_employees():
-    """Get the most recent stress record for each active employee"""
+def get_latest_stress_for_all_employees(limit=200):
+    """Get the most recent stress record for up to `limit` active employees, ordered by employee_id"""
     pipeline = [
-        {"$sort": {"timestamp": -1}},
+        # Walks the (employee_id, timestamp) index backwards: newest record first per employee
+        {"$sort": {"employee_id": -1, "timestamp": -1}},
         {"$group": {
             "_id": "$employee_id",
             "latest_record": {"$first": "$$ROOT"}
         }},
-        {"$replaceRoot": {"newRoot": "$latest_record"}}
+        {"$replaceRoot": {"newRoot": "$latest_record"}},
+        # Stable order so the limit always keeps the same employees; a cursor on
+        # employee_id ({"$match": {"employee_id": {"$gt": last_seen}}}) slots in here for paging
+        {"$sort": {"employee_id": 1}},
+        {"$lookup": {
+            "from": employees_collection.name,
+            "let": {"employee_id": "$employee_id"},
+            "pipeline": [
+                {"$match": {
+                    "$expr": {"$eq": ["$employee_id", "$$employee_id"]},
+                    "active": {"$ne": False}
+                }},
+                {"$project": {"_id": 0, "display_name": 1}}
+            ],
+            "as": "employee"
+        }},
+        # Records without an active employee are dropped here
+        {"$unwind": "$employee"},
+        {"$limit": limit},
+        # Only the fields LatestStressRecord returns
+        {"$project": {
+            "_id": 0,
+            "employee_id": 1,
+            "display_name": "$employee.display_name",
+            "latest_stress_level": "$stress_level",
+            "latest_emotion": "$emotion",
+            "confidence": 1,
+            "timestamp": 1,
+            "device_id": 1
+        }}
     ]
     
     return list(stress_records_collection.aggregate(pipeline))
 
 def get_all_stress_records(limit=100):
     """Get all stress records from the database (for demo/admin purposes)"""
-    return list(stress_records_collection.find({}).sort("timestamp", -1).limit(limit))
+    return list(stress_records_collection.find({}, {"_id": 0}).sort("timestamp", -1).limit(limit))
 
 # Command operations
 def create_command(command_data: CommandCreate) -> Command:
@@ -297,10 +383,10 @@ def get_pending_commands(device_id: str):
     return list(commands_collection.find({
         "device_id": device_id,
         "status": "pending"
-    }))
+    }, {"_id": 0}))
 
 def update_command(command_id: str, update_data: CommandUpdate):
-    """Update a command's status"""
+    """Update a command's status and return the updated command (None if not found)"""
     update_fields = {"status": update_data.status}
     
     if update_data.status == "ack":
@@ -311,9 +397,11 @@ def update_command(command_id: str, update_data: CommandUpdate):
     if update_data.error:
         update_fields["error"] = update_data.error
     
-    commands_collection.update_one(
+    return commands_collection.find_one_and_update(
         {"command_id": command_id},
-        {"$set": update_fields}
+        {"$set": update_fields},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
 
 def process_image_for_stress(image_base64: str, device_id: str, employee_id: str) -> dict:
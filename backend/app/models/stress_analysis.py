@@ -3,9 +3,16 @@ import numpy as np
 # from deepface import DeepFace  # Removed - using custom CNN model instead
 import logging
 from app.core.config import settings
-import base64
+try:
+    # SIMD-accelerated drop-in replacement for the stdlib decoder
+    import pybase64 as base64
+except ImportError:
+    import base64
 from typing import Dict, Tuple, Any, Optional
 import os
+import queue
+import threading
+from concurrent.futures import Future
 from tensorflow.keras.models import load_model
 from tensorflow.keras.utils import load_img, img_to_array
 from tensorflow.keras.layers import InputLayer
@@ -54,23 +61,83 @@ EMOTION_TO_STRESS = {
     "disgusted": ("High", 0.9),
 }
 
-# Global model variable
+# Optional TFLite export of the same model, used instead of Keras when present.
+# Produce it with ModelTraning/stress_detector.py --tflite [--int8]
+TFLITE_MODEL_PATH = os.getenv(
+    "TFLITE_MODEL_PATH",
+    os.path.join(os.path.dirname(__file__), 'stress_cnn_model_int8.tflite')
+)
+
+# YuNet face detector (optional, falls back to Haar cascade when missing)
+FACE_DETECTOR_PATH = os.getenv(
+    "FACE_DETECTOR_PATH",
+    os.path.join(os.path.dirname(__file__), 'face_detection_yunet_2023mar.onnx')
+)
+
+# Longest image side used for face detection; larger frames are downscaled
+DETECTION_MAX_SIDE = 480
+
+# JPEG decode-time downscaling (libjpeg DCT scaling) by reduction factor
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Haar cascade fallback, parsed once at import rather than on every request
+_FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+# Global model variables
 _custom_model = None
+_tflite_interpreter = None
+_tflite_details = None
+_tflite_lock = threading.Lock()  # an interpreter must not be invoked concurrently
+_face_detector = None
+
+# Micro-batching of concurrent predictions into one forward pass
+INFERENCE_MAX_BATCH = 8
+_inference_queue = queue.Queue()
+_inference_thread = None
+_inference_thread_lock = threading.Lock()
+
+def load_face_detector():
+    """Load the YuNet face detector once, if the model file is available."""
+    global _face_detector
+    if _face_detector is None:
+        if not os.path.exists(FACE_DETECTOR_PATH) or not hasattr(cv2, 'FaceDetectorYN'):
+            return False
+        try:
+            _face_detector = cv2.FaceDetectorYN.create(FACE_DETECTOR_PATH, "", (320, 320), 0.6, 0.3, 5000)
+            logger.info(f"✅ YuNet face detector loaded from {FACE_DETECTOR_PATH}")
+        except Exception as e:
+            logger.error(f"❌ Error loading YuNet face detector: {e}")
+            return False
+    return True
 
 def detect_face(img):
     """Detect if a face is present in the image and return face location"""
     try:
+        if load_face_detector():
+            # YuNet runs a single forward pass on the BGR image
+            h, w = img.shape[:2]
+            _face_detector.setInputSize((w, h))
+            _, detections = _face_detector.detect(img)
+            if detections is None:
+                faces = np.empty((0, 4), dtype=np.int32)
+            else:
+                faces = np.maximum(detections[:, :4], 0).astype(np.int32)
+            logger.info(f"Face detection found {len(faces)} faces")
+            return len(faces) > 0, faces
+
         # Convert to grayscale
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
-        # Load the face cascade classifier
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        if face_cascade.empty():
+        if _FACE_CASCADE.empty():
             logger.error("Failed to load face cascade classifier")
             return False, None
 
         # Very lenient face detection parameters for laptop cameras
-        faces = face_cascade.detectMultiScale(
+        faces = _FACE_CASCADE.detectMultiScale(
             gray,
             scaleFactor=1.02,  # More lenient scale factor
             minNeighbors=2,    # Reduced minimum neighbors
@@ -87,38 +154,30 @@ def detect_face(img):
 def check_face_quality(img, face_location):
     """Check if the face is well-lit and properly positioned"""
     try:
-        x, y, w, h = face_location[0]
+        x, y, w, h = (int(v) for v in face_location[0])
+        img_h, img_w = img.shape[:2]
         face_roi = img[y:y+h, x:x+w]
         
-        # Check brightness
-        gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
-        brightness = np.mean(gray_face)
+        # Check brightness (BT.601 luma from the per-channel means, no gray copy)
+        mean_b, mean_g, mean_r, _ = cv2.mean(face_roi)
+        brightness = 0.114 * mean_b + 0.587 * mean_g + 0.299 * mean_r
         
         # Check face size relative to image
-        img_area = img.shape[0] * img.shape[1]
-        face_area = w * h
-        face_ratio = face_area / img_area
+        face_ratio = (w * h) / (img_w * img_h)
         
-        # Check face position (should be roughly centered)
-        center_x = x + w/2
-        center_y = y + h/2
-        img_center_x = img.shape[1]/2
-        img_center_y = img.shape[0]/2
-        
-        # Calculate distance from center (normalized)
-        center_distance = np.sqrt(
-            ((center_x - img_center_x) / img.shape[1])**2 +
-            ((center_y - img_center_y) / img.shape[0])**2
-        )
+        # Check face position (should be roughly centered), normalized offsets
+        dx = (x + w / 2) / img_w - 0.5
+        dy = (y + h / 2) / img_h - 0.5
+        center_distance_sq = dx * dx + dy * dy
         
         # Very lenient quality checks for laptop cameras
         quality = {
             "is_bright": brightness > 20,  # Much lower brightness threshold
             "is_proper_size": 0.01 < face_ratio < 0.8,  # More lenient size range
-            "is_centered": center_distance < 0.5,  # More lenient centering
-            "brightness": float(brightness),
-            "face_ratio": float(face_ratio),
-            "center_distance": float(center_distance)
+            "is_centered": center_distance_sq < 0.25,  # More lenient centering (distance < 0.5)
+            "brightness": brightness,
+            "face_ratio": face_ratio,
+            "center_distance": center_distance_sq ** 0.5
         }
         
         logger.info(f"Face quality metrics: {quality}")
@@ -134,9 +193,31 @@ def check_face_quality(img, face_location):
             "center_distance": 1
         }
 
+def load_tflite_model():
+    """Load the TFLite model once, if the file is available."""
+    global _tflite_interpreter, _tflite_details
+    if _tflite_interpreter is None:
+        if not os.path.exists(TFLITE_MODEL_PATH):
+            return False
+        try:
+            interpreter = tf.lite.Interpreter(
+                model_path=TFLITE_MODEL_PATH,
+                num_threads=max(1, (os.cpu_count() or 2) // 2)
+            )
+            interpreter.allocate_tensors()
+            _tflite_details = (interpreter.get_input_details()[0], interpreter.get_output_details()[0])
+            _tflite_interpreter = interpreter
+            logger.info(f"✅ TFLite model loaded successfully from {TFLITE_MODEL_PATH}")
+        except Exception as e:
+            logger.error(f"❌ Error loading TFLite model: {e}")
+            return False
+    return True
+
 def load_custom_model():
     """Load the custom CNN model."""
     global _custom_model
+    if load_tflite_model():
+        return True
     if _custom_model is None:
         try:
             if os.path.exists(MODEL_PATH):
@@ -156,24 +237,73 @@ def load_custom_model():
 def preprocess_face_for_model(face_img):
     """Preprocess face image for custom model prediction."""
     try:
-        # Resize to model input size (64x64)
-        face_resized = cv2.resize(face_img, (64, 64))
-        
-        # Convert BGR to RGB if needed
-        if face_resized.shape[2] == 3:
-            face_rgb = cv2.cvtColor(face_resized, cv2.COLOR_BGR2RGB)
-        else:
-            face_rgb = face_resized
-        
-        # Normalize and add batch dimension
-        face_array = face_rgb.astype(np.float32) / 255.0
-        face_array = np.expand_dims(face_array, axis=0)
-        
-        return face_array
+        # Resize to 64x64, BGR->RGB, scale to [0, 1] and add the batch axis
+        # in one native pass; blobFromImage returns NCHW, the model wants NHWC
+        blob = cv2.dnn.blobFromImage(face_img, 1.0 / 255.0, (64, 64), swapRB=True, crop=False)
+        return np.ascontiguousarray(blob.transpose(0, 2, 3, 1))
     except Exception as e:
         logger.error(f"Error preprocessing face for model: {e}")
         return None
 
+def run_custom_model(batch):
+    """Run the loaded model on a preprocessed NHWC float batch, returning probabilities."""
+    global _tflite_details
+    if _tflite_interpreter is None:
+        return _custom_model(batch, training=False).numpy()
+    
+    with _tflite_lock:
+        input_details, output_details = _tflite_details
+        if tuple(input_details['shape']) != batch.shape:
+            _tflite_interpreter.resize_tensor_input(input_details['index'], batch.shape)
+            _tflite_interpreter.allocate_tensors()
+            _tflite_details = (_tflite_interpreter.get_input_details()[0], _tflite_interpreter.get_output_details()[0])
+            input_details, output_details = _tflite_details
+        if input_details['dtype'] == np.int8:
+            scale, zero_point = input_details['quantization']
+            batch = np.clip(np.round(batch / scale + zero_point), -128, 127).astype(np.int8)
+        _tflite_interpreter.set_tensor(input_details['index'], batch)
+        _tflite_interpreter.invoke()
+        output = _tflite_interpreter.get_tensor(output_details['index'])
+    
+    if output_details['dtype'] == np.int8:
+        scale, zero_point = output_details['quantization']
+        output = (output.astype(np.float32) - zero_point) * scale
+    return output
+
+def _inference_worker():
+    """Run queued faces through the model, batching whatever is waiting."""
+    while True:
+        items = [_inference_queue.get()]
+        # Requests that arrived while the previous batch ran join this one
+        while len(items) < INFERENCE_MAX_BATCH:
+            try:
+                items.append(_inference_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        try:
+            batch = np.concatenate([face for face, _ in items])
+            predictions = run_custom_model(batch)
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            continue
+        for i, (_, future) in enumerate(items):
+            future.set_result(predictions[i])
+
+def predict_batched(processed_face):
+    """Queue one preprocessed face for batched inference and wait for its probabilities."""
+    global _inference_thread
+    if _inference_thread is None:
+        with _inference_thread_lock:
+            if _inference_thread is None:
+                _inference_thread = threading.Thread(target=_inference_worker, daemon=True)
+                _inference_thread.start()
+    
+    future = Future()
+    _inference_queue.put((processed_face, future))
+    return future.result()
+
 def predict_emotion_with_custom_model(face_img):
     """Predict emotion using custom CNN model."""
     if not load_custom_model():
@@ -186,10 +316,10 @@ def predict_emotion_with_custom_model(face_img):
             return None
         
         # Make prediction
-        predictions = _custom_model.predict(processed_face, verbose=0)
-        predicted_class_idx = np.argmax(predictions[0])
+        predictions = predict_batched(processed_face)
+        predicted_class_idx = np.argmax(predictions)
         predicted_class = CLASS_NAMES[predicted_class_idx]
-        confidence = float(predictions[0][predicted_class_idx])
+        confidence = float(predictions[predicted_class_idx])
         
         # Map to stress level
         stress_level, base_score = EMOTION_TO_STRESS[predicted_class]
@@ -206,6 +336,38 @@ def predict_emotion_with_custom_model(face_img):
         logger.error(f"Error making prediction with custom model: {e}")
         return None
 
+def get_jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a JPEG's SOF header without decoding it"""
+    if data[:2] != b'\xff\xd8':
+        return None
+    i, n = 2, len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[i + 5:i + 7], 'big')
+            width = int.from_bytes(data[i + 7:i + 9], 'big')
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+def decode_image(image_bytes: bytes) -> Tuple[Optional[np.ndarray], int]:
+    """Decode an image, letting libjpeg downscale large JPEGs during decoding.
+
+    Returns the image and the factor it was reduced by.
+    """
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    size = get_jpeg_size(image_bytes)
+    if size is not None:
+        for factor, flag in _REDUCED_DECODE_FLAGS:
+            if max(size) // factor >= DETECTION_MAX_SIDE:
+                return cv2.imdecode(nparr, flag), factor
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR), 1
+
 def analyze_image(image_data: str) -> Dict[str, Any]:
     """
     Analyze an image for emotion detection and stress analysis
@@ -217,16 +379,22 @@ def analyze_image(image_data: str) -> Dict[str, Any]:
     """
     try:
         # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        logger.info(f"Image decoded successfully. Shape: {img.shape}")
+        image_bytes = base64.b64decode(image_data, validate=False)
+        img, decode_scale = decode_image(image_bytes)
         
         if img is None:
             return {"error": "Failed to process image data"}
+        logger.info(f"Image decoded successfully. Shape: {img.shape}, reduced by {decode_scale}x")
 
-        # Check if face is present
-        face_detected, face_locations = detect_face(img)
+        # Detect on a downscaled copy, then map boxes back to full resolution
+        scale = DETECTION_MAX_SIDE / max(img.shape[:2])
+        if scale < 1:
+            small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            face_detected, face_locations = detect_face(small)
+            if face_detected:
+                face_locations = np.round(np.asarray(face_locations) / scale).astype(np.int32)
+        else:
+            face_detected, face_locations = detect_face(img)
         if not face_detected:
             logger.warning("No face detected in the image")
             return {"error": "No face detected. Please ensure your face is visible in the camera."}
@@ -291,23 +459,17 @@ def analyze_image(image_data: str) -> Dict[str, Any]:
         if face_detected and isinstance(face_locations, np.ndarray) and face_locations.shape[0] > 0:
             # Ensure the first detected face has 4 coordinates (x, y, w, h)
             if len(face_locations[0]) == 4:
-                detected_face_coords = face_locations[0].tolist()
+                # Report coordinates in the resolution the client sent
+                detected_face_coords = (face_locations[0] * decode_scale).tolist()
         
         # Create result
         result = {
             "emotion": emotion,
             "stress_level": stress_level,
-            "confidence": float(confidence),
-            "stress_score": float(stress_score),
+            "confidence": confidence,
+            "stress_score": stress_score,
             "suggestions": suggestions,
-            "face_quality": {
-                "is_bright": bool(quality["is_bright"]),
-                "is_proper_size": bool(quality["is_proper_size"]),
-                "is_centered": bool(quality["is_centered"]),
-                "brightness": float(quality["brightness"]),
-                "face_ratio": float(quality["face_ratio"]),
-                "center_distance": float(quality["center_distance"])
-            },
+            "face_quality": quality,
             "face_coords": detected_face_coords
         }
         
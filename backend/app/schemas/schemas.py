@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -145,6 +145,21 @@ class StressSubmission(BaseModel):
     timestamp: str
     face_quality: Optional[FaceQuality] = None
 
+class StressRecordCreate(BaseModel):
+    """Stress reading posted by a device; device and employee come from its API key"""
+    emotion: EmotionEnum
+    stress_level: StressLevelEnum
+    confidence: float = Field(..., ge=0, le=100)
+    timestamp: Optional[str] = None
+    face_quality: Optional[FaceQuality] = None
+
+class RemoteStressSubmission(BaseModel):
+    """Stress reading posted in answer to a manager's remote check request"""
+    emotion: EmotionEnum
+    stress_level: StressLevelEnum
+    confidence: float = Field(..., ge=0, le=100)
+    request_id: str
+
 class StressResponse(BaseModel):
     record_id: str
 
@@ -205,6 +220,8 @@ class LoginRequest(BaseModel):
     password: str
 
 class JournalEntry(BaseModel):
+    model_config = ConfigDict(str_max_length=10_000)
+    
     mood: str
     note: str
     stressLevel: str
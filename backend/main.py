@@ -1,11 +1,14 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.api.api import api_router
+from app.db.journal_writer import journal_writer
+from app.db.last_active_writer import last_active_writer
 from app.core.config import settings
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from app.core.security.deps import limiter
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+import anyio
 import logging
 import os
 import threading
@@ -20,9 +23,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create rate limiter
-limiter = Limiter(key_func=get_remote_address)
-
 # Create FastAPI app
 app = FastAPI(
     title="StressSense API",
@@ -30,9 +30,10 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
 )
 
-# Add rate limiter to app
+# Add rate limiter to app (the same instance the endpoint decorators use)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -69,6 +70,32 @@ except Exception as e:
 # Add API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
+@app.on_event("startup")
+async def configure_threadpool():
+    """Size the threadpool used for blocking work such as image analysis"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    logger.info(f"Threadpool size set to {settings.THREADPOOL_SIZE}")
+
+@app.on_event("startup")
+async def start_journal_writer():
+    """Start batching journal entry inserts"""
+    await journal_writer.start()
+
+@app.on_event("shutdown")
+async def stop_journal_writer():
+    """Flush any queued journal entries before exiting"""
+    await journal_writer.stop()
+
+@app.on_event("startup")
+async def start_last_active_writer():
+    """Start batching device last_active updates"""
+    await last_active_writer.start()
+
+@app.on_event("shutdown")
+async def stop_last_active_writer():
+    """Write pending device last_active updates before exiting"""
+    await last_active_writer.stop()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():